@@ -122,21 +122,154 @@ RET cc  If cc is true, RET else continue.   If cc is true, 20 else 8.
 RETI    Return then enable interrupts.  16
 """
 
-# import pdb
+import ast
+import functools
+import inspect
+import textwrap
+
+
+FLAG_Z = 0x80   # zero
+FLAG_N = 0x40   # subtract
+FLAG_H = 0x20   # half-carry
+FLAG_C = 0x10   # carry
+
+REGISTER_NAMES = ('a', 'f', 'b', 'c', 'd', 'e', 'h', 'l',
+                  'pc', 'sp', 'ime')
+
+# Register selected by a 3-bit opcode field (None is the (HL) operand).
+REG8 = ('b', 'c', 'd', 'e', 'h', 'l', None, 'a')
+
+# Handler for each ALU operation selected by bits 3-5 of opcodes 0x80-0xBF:
+# ADD, ADC, SUB, SBC, AND, XOR, OR, CP.
+ALU_OPS = ('_add_a_n', '_adc_a_n', '_sub_n', '_sub_a_n',
+           '_and_n', '_xor_a_n', '_or_n', '_cp_n')
+
+# Rotate/shift selected by bits 3-5 of CB opcodes 0x00-0x3F, and the bit
+# operation selected by bits 6-7 of CB opcodes 0x40-0xFF.
+CB_SHIFT_OPS = ('rlc', 'rrc', 'rl', 'rr', 'sla', 'sra', 'swap', 'srl')
+CB_BIT_OPS = (None, 'bit', 'res', 'set')
+
+
+def _build_alu_tables(subtract):
+    """Return (result, flags) lookup tables for 8-bit ADD/ADC or SUB/SBC.
+
+    Both tables are indexed by (carry << 16) | (a << 8) | n, so the same
+    pair serves the carry-less and carry-in variants of the operation.
+    """
+    result_table = bytearray(0x20000)
+    flags_table = bytearray(0x20000)
+    for carry in (0, 1):
+        for a in range(256):
+            base = (carry << 16) | (a << 8)
+            for n in range(256):
+                if subtract:
+                    result = a - n - carry
+                    half = (a & 0xF) - (n & 0xF) - carry < 0
+                    flags = FLAG_N | (FLAG_C if result < 0 else 0)
+                else:
+                    result = a + n + carry
+                    half = (a & 0xF) + (n & 0xF) + carry > 0xF
+                    flags = FLAG_C if result > 255 else 0
+                result &= 255
+                if not result:
+                    flags |= FLAG_Z
+                if half:
+                    flags |= FLAG_H
+                result_table[base | n] = result
+                flags_table[base | n] = flags
+    return result_table, flags_table
+
+
+ADD_RESULT, ADD_FLAGS = _build_alu_tables(subtract=False)
+SUB_RESULT, SUB_FLAGS = _build_alu_tables(subtract=True)
+
+# Signed value of an 8-bit displacement (JR e, LD HL,SP+e, ADD SP,e).
+SIGNED8 = tuple(n - 256 if n > 127 else n for n in range(256))
+
+# Z/N/H flags for INC and DEC, indexed by the 8-bit result.
+INC_FLAGS = bytes(
+    (0 if r else FLAG_Z) | (0 if r & 0xF else FLAG_H)
+    for r in range(256))
+DEC_FLAGS = bytes(
+    FLAG_N | (0 if r else FLAG_Z) |
+    (FLAG_H if r & 0xF == 0xF else 0)
+    for r in range(256))
+
+# Result and Z/C flags of the CB rotates, indexed by the operand.
+RLC_RESULT = bytes(((v << 1) | (v >> 7)) & 255 for v in range(256))
+RLC_FLAGS = bytes(
+    (0 if v else FLAG_Z) | (FLAG_C if v & 0x80 else 0) for v in range(256))
+SWAP_RESULT = bytes(((v << 4) | (v >> 4)) & 255 for v in range(256))
+
+# Machine cycles (m) taken by each opcode.  Conditional jumps and returns
+# list their not-taken cost; the handler adds the rest when taken.
+OPCODE_CYCLES = bytes([
+    1, 3, 2, 1, 1, 1, 2, 1, 4, 3, 2, 1, 1, 1, 2, 0,  # 0x00
+    0, 3, 2, 1, 1, 1, 2, 0, 3, 3, 2, 1, 1, 1, 2, 0,  # 0x10
+    2, 3, 2, 1, 1, 1, 2, 0, 2, 3, 2, 1, 1, 1, 2, 1,  # 0x20
+    2, 3, 2, 1, 0, 0, 3, 1, 2, 3, 2, 1, 1, 1, 2, 0,  # 0x30
+    1, 1, 1, 1, 1, 1, 2, 1, 1, 1, 1, 1, 1, 1, 2, 1,  # 0x40
+    1, 1, 1, 1, 1, 1, 2, 1, 1, 1, 1, 1, 1, 1, 2, 1,  # 0x50
+    1, 1, 1, 1, 1, 1, 2, 1, 1, 1, 1, 1, 1, 1, 2, 1,  # 0x60
+    2, 2, 2, 2, 2, 2, 1, 2, 1, 1, 1, 1, 1, 1, 2, 1,  # 0x70
+    1, 1, 1, 1, 1, 1, 0, 1, 1, 1, 1, 1, 1, 1, 0, 1,  # 0x80
+    1, 1, 1, 1, 1, 1, 0, 1, 1, 1, 1, 1, 1, 1, 0, 1,  # 0x90
+    1, 1, 1, 1, 1, 1, 2, 1, 1, 1, 1, 1, 1, 1, 0, 1,  # 0xA0
+    1, 1, 1, 1, 1, 1, 0, 1, 1, 1, 1, 1, 1, 1, 0, 1,  # 0xB0
+    1, 3, 3, 3, 0, 3, 0, 3, 1, 3, 3, 0, 0, 5, 0, 3,  # 0xC0
+    1, 3, 3, 0, 0, 3, 0, 3, 1, 3, 3, 0, 0, 0, 0, 3,  # 0xD0
+    3, 3, 2, 0, 0, 3, 2, 3, 4, 0, 4, 0, 0, 0, 0, 3,  # 0xE0
+    3, 3, 2, 1, 0, 3, 2, 3, 3, 2, 4, 1, 0, 0, 2, 3,  # 0xF0
+])
+
+# Machine cycles (m) taken by each CB-prefixed opcode.
+CB_CYCLES = bytes([
+    2, 2, 2, 2, 2, 2, 0, 2, 0, 0, 0, 0, 0, 0, 0, 0,  # 0x00
+    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,  # 0x10
+    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,  # 0x20
+    2, 2, 2, 2, 2, 2, 4, 2, 0, 0, 0, 0, 0, 0, 0, 0,  # 0x30
+    2, 2, 2, 2, 2, 2, 3, 2, 2, 2, 2, 2, 2, 2, 3, 2,  # 0x40
+    2, 2, 2, 2, 2, 2, 3, 2, 2, 2, 2, 2, 2, 2, 3, 2,  # 0x50
+    2, 2, 2, 2, 2, 2, 3, 2, 2, 2, 2, 2, 2, 2, 3, 2,  # 0x60
+    2, 2, 2, 2, 2, 2, 3, 2, 2, 2, 2, 2, 2, 2, 3, 2,  # 0x70
+    2, 2, 2, 2, 2, 2, 4, 2, 2, 2, 2, 2, 2, 2, 4, 2,  # 0x80
+    2, 2, 2, 2, 2, 2, 4, 2, 2, 2, 2, 2, 2, 2, 4, 2,  # 0x90
+    2, 2, 2, 2, 2, 2, 4, 2, 2, 2, 2, 2, 2, 2, 4, 2,  # 0xA0
+    2, 2, 2, 2, 2, 2, 4, 2, 2, 2, 2, 2, 2, 2, 4, 2,  # 0xB0
+    2, 2, 2, 2, 2, 2, 4, 2, 2, 2, 2, 2, 2, 2, 4, 2,  # 0xC0
+    2, 2, 2, 2, 2, 2, 4, 2, 2, 2, 2, 2, 2, 2, 4, 2,  # 0xD0
+    2, 2, 2, 2, 2, 2, 4, 2, 2, 2, 2, 2, 2, 2, 4, 2,  # 0xE0
+    2, 2, 2, 2, 2, 2, 4, 2, 2, 2, 2, 2, 2, 2, 4, 2,  # 0xF0
+])
+
+# Handlers of one-byte opcodes that neither touch pc nor write memory.
+# Runs of these are fused into a single block function (see
+# _compile_block), up to MAX_BLOCK_LEN opcodes long.
+FUSABLE_HANDLERS = frozenset((
+    '_nop', '_ld_rr', '_ld_r_hlm', '_ld_a_r1r2m', '_ld_a_hl_i', '_ld_a_hl_d',
+    '_ld_a_c', '_ld_sp_hl', '_inc_r', '_dec_r', '_inc_r_r', '_dec_r_r',
+    '_inc_sp', '_dec_sp', '_add_hl_n', '_add_hl_sp', '_add_a_n', '_adc_a_n',
+    '_sub_n', '_sub_a_n', '_and_n', '_or_n', '_xor_a_n', 'cpl', '_scf',
+    '_rlc_a', '_di', '_ei',
+))
+MAX_BLOCK_LEN = 16
+
+# Times run_until must reach an address before it builds a block there,
+# so code that only runs once (boot, init) never pays for compiling.
+HOT_BLOCK_VISITS = 2
+
+# Blocks are only built from ROM, which the cpu never writes to.
+ROM_END = 0x8000
 
 
-FLAG = {
-    'zero': 0x80,           # Z flag
-    'sub': 0x40,    # N flag
-    'half-carry': 0x20,     # H flag
-    'carry': 0x10           # C flag
-}
+class ExecutionHalted(Exception):
+    """Raised when execution should stop."""
 
-my_counter = 0
+    pass
 
 
-class ExecutionHalted(Exception):
-    """Raised when execution should stop."""
+class _CpuHalted(Exception):
+    """Raised by HALT to leave the dispatch loop until an interrupt."""
 
     pass
 
@@ -144,809 +277,349 @@ class ExecutionHalted(Exception):
 class GbZ80Cpu(object):
     """The Z80 CPU class."""
 
+    # Registers live in fixed slots rather than a dict so that each access
+    # in an opcode handler is a plain attribute load/store.
+    __slots__ = (
+        'a', 'f', 'b', 'c', 'd', 'e', 'h', 'l',     # 8-bit registers
+        'pc', 'sp',                                 # 16-bit registers
+        'ime',                                      # interrupts on/off
+        'halted',                                   # waiting for interrupt
+        'clock_m', 'sys_interface', 'mem', 'rsv', 'blocks', 'block_visits',
+    )
+
     def __init__(self):
         """Initialize an instance."""
-        self.clock = {'m': 0}  # Time clock
+        self.clock_m = 0  # Time clock, in machine cycles (cpu cycles/4)
 
         self.sys_interface = None    # Set after interface instantiated.
+        self.mem = None     # Raw memory buffer, set with the interface.
+        self._reset_blocks()
 
         # Register set
-        self.registers = {
-            # 16-bit registers stored as two 8-bit registers
-            # 15..8   7..0
-            'a': 1, 'f': 0,
-            'b': 0, 'c': 0x13,
-            'd': 0, 'e': 216,
-            'h': 0, 'l': 0,
-
-            # Interrupts enabled/disabled
-            'ime': 0,
-
-            # 16-bit registers (program counter, stack pointer)
-            'pc': 0x100, 'sp': 0xFFFE,
-
-            # Clock for last instr
-            'm': 0      # cpu cycles/4
-        }
-
-        self.rsv = {'a': 0, 'b': 0, 'c': 0, 'd': 0, 'e': 0, 'f': 0,
-                    'h': 0, 'l': 0}
-
-        self.opcode_map = {
-            # opcode number: func to call, args
-            0: (self._nop, ()),  # NOP
-            1: (self._ld_r1r2_nn, ('b', 'c')),  # LDBCnn
-            2: (self._ld_r1r2m_a, ('b', 'c')),  # LDBCmA
-            3: (self._inc_r_r, ('b', 'c')),  # INCBC
-            4: (self._inc_r, ('b',)),  # INCr_b
-            5: (self._dec_r, ('b',)),  # DECr_b
-            6: (self._ld_rn, ('b',)),  # LDrn_b
-            7: (self._rlc_a, ()),  # RLCA
-            8: (self._ld_nn_sp, ()),  # LDnnSP -- double check this one...
-            9: (self._add_hl_n, ('b', 'c')),  # ADDHLBC
-            10: (self._ld_a_r1r2m, ('b', 'c')),  # LDABCm
-            11: (self._dec_r_r, ('b', 'c')),  # DECBC
-            12: (self._inc_r, ('c',)),  # INCr_c
-            13: (self._dec_r, ('c',)),  # DECr_c
-            14: (self._ld_rn, ('c',)),  # LDrn_c
-            15: (self._raise_opcode_unimplemented, ()),  # RRCA
-            16: (self._raise_opcode_unimplemented, ()),  # DJNZn
-            17: (self._ld_r1r2_nn, ('d', 'e')),  # LDDEnn
-            18: (self._ld_r1r2m_a, ('d', 'e')),  # LDDEmA
-            19: (self._inc_r_r, ('d', 'e')),  # INCDE
-            20: (self._inc_r, ('d',)),  # INCr_d
-            21: (self._dec_r, ('d',)),  # DECr_d
-            22: (self._ld_rn, ('d',)),  # LDrn_d
-            23: (self._raise_opcode_unimplemented, ()),  # RLA
-            24: (self._jr_n, ()),  # JRn
-            25: (self._add_hl_n, ('d', 'e')),  # ADDHLDE
-            26: (self._ld_a_r1r2m, ('d', 'e')),  # LDADEm
-            27: (self._dec_r_r, ('d', 'e')),  # DECDE
-            28: (self._inc_r, ('e',)),  # INCr_e
-            29: (self._dec_r, ('e',)),  # DECr_e
-            30: (self._ld_rn, ('e',)),  # LDrn_e
-            31: (self._raise_opcode_unimplemented, ()),  # RRA
-            32: (self._jr_cc_n, (FLAG['zero'], 0x00)),  # JRNZn
-            33: (self._ld_r1r2_nn, ('h', 'l')),  # LDHLnn
-            34: (self._ld_hlmi_a, ()),  # LDHLIA
-            35: (self._inc_r_r, ('h', 'l')),  # INCHL
-            36: (self._inc_r, ('h',)),  # INCr_h
-            37: (self._dec_r, ('h',)),  # DECr_h
-            38: (self._ld_rn, ('h',)),  # LDrn_h
-            39: (self._raise_opcode_unimplemented, ()),  # XX
-            40: (self._jr_cc_n, (FLAG['zero'], FLAG['zero'])),  # JRZn
-            41: (self._add_hl_n, ('h', 'l')),  # ADDHLHL
-            42: (self._ld_a_hl_i, ()),  # LDAHLI
-            43: (self._dec_r_r, ('h', 'l')),  # DECHL
-            44: (self._inc_r, ('l',)),  # INCr_l
-            45: (self._dec_r, ('l',)),  # DECr_l
-            46: (self._ld_rn, ('l',)),  # LDrn_l
-            47: (self.cpl, ()),  # CPL
-            48: (self._jr_cc_n, (0x10, 0x00)),  # JRNCn
-            49: (self._ld_sp_nn, ()),  # LD SP nn
-            50: (self._ld_hlmd_a, ()),  # LDHLDA
-            51: (self._inc_sp, ()),  # INC SP
-            52: (self._raise_opcode_unimplemented, ()),  # INCHLm
-            53: (self._raise_opcode_unimplemented, ()),  # DECHLm
-            54: (self._ld_hlm_n, ()),  # LDHLmn
-            55: (self._scf, ()),  # SCF
-            56: (self._jr_cc_n, (0x10, 0x10)),  # JRCn
-            57: (self._add_hl_sp, ()),  # ADDHLSP
-            58: (self._ld_a_hl_d, ()),  # LDAHLD
-            59: (self._dec_sp, ()),  # DECSP
-            60: (self._inc_r, ('a',)),  # INCr_a
-            61: (self._dec_r, ('a',)),  # DECr_a
-            62: (self._ld_rn, ('a',)),  # LDrn_a
-            63: (self._raise_opcode_unimplemented, ()),  # CCF
-            64: (self._ld_rr, ('b', 'b')),  # LDrr_bb (nop?)
-            65: (self._ld_rr, ('b', 'c')),  # LDrr_bc
-            66: (self._ld_rr, ('b', 'd')),  # LDrr_bd
-            67: (self._ld_rr, ('b', 'e')),  # LDrr_be
-            68: (self._ld_rr, ('b', 'h')),  # LDrr_bh
-            69: (self._ld_rr, ('b', 'l')),  # LDrr_bl
-            70: (self._ld_r_hlm, ('b',)),  # LDrHLm_b
-            71: (self._ld_rr, ('b', 'a')),  # LDrr_ba
-            72: (self._ld_rr, ('c', 'b')),  # LDrr_cb
-            73: (self._ld_rr, ('c', 'c')),  # LDrr_cc (nop?)
-            74: (self._ld_rr, ('c', 'd')),  # LDrr_cd
-            75: (self._ld_rr, ('c', 'e')),  # LDrr_ce
-            76: (self._ld_rr, ('c', 'h')),  # LDrr_ch
-            77: (self._ld_rr, ('c', 'l')),  # LDrr_cl
-            78: (self._ld_r_hlm, ('c',)),  # LDrHLm_c
-            79: (self._ld_rr, ('c', 'a')),  # LDrr_ca
-            80: (self._ld_rr, ('d', 'b')),  # LDrr_db
-            81: (self._ld_rr, ('d', 'c')),  # LDrr_dc
-            82: (self._ld_rr, ('d', 'd')),  # LDrr_dd (nop?)
-            83: (self._ld_rr, ('d', 'e')),  # LDrr_de
-            84: (self._ld_rr, ('d', 'h')),  # LDrr_dh
-            85: (self._ld_rr, ('d', 'l')),  # LDrr_dl
-            86: (self._ld_r_hlm, ('d',)),  # LDrHLm_d
-            87: (self._ld_rr, ('d', 'a')),  # LDrr_da
-            88: (self._ld_rr, ('e', 'b')),  # LDrr_eb
-            89: (self._ld_rr, ('e', 'c')),  # LDrr_ec
-            90: (self._ld_rr, ('e', 'd')),  # LDrr_ed
-            91: (self._ld_rr, ('e', 'e')),  # LDrr_ee (nop?)
-            92: (self._ld_rr, ('e', 'h')),  # LDrr_eh
-            93: (self._ld_rr, ('e', 'l')),  # LDrr_el
-            94: (self._ld_r_hlm, ('e',)),  # LDrHLm_e
-            95: (self._ld_rr, ('e', 'a')),  # LDrr_ea
-            96: (self._ld_rr, ('h', 'b')),  # LDrr_hb
-            97: (self._ld_rr, ('h', 'c')),  # LDrr_hc
-            98: (self._ld_rr, ('h', 'd')),  # LDrr_hd
-            99: (self._ld_rr, ('h', 'e')),  # LDrr_he
-            100: (self._ld_rr, ('h', 'h')),  # LDrr_hh (nop?)
-            101: (self._ld_rr, ('h', 'l')),  # LDrr_hl
-            102: (self._ld_r_hlm, ('h',)),  # LDrHLm_h
-            103: (self._ld_rr, ('h', 'a')),  # LDrr_ha
-            104: (self._ld_rr, ('l', 'b')),  # LDrr_lb
-            105: (self._ld_rr, ('l', 'c')),  # LDrr_lc
-            106: (self._ld_rr, ('l', 'd')),  # LDrr_ld
-            107: (self._ld_rr, ('l', 'e')),  # LDrr_le
-            108: (self._ld_rr, ('l', 'h')),  # LDrr_lh
-            109: (self._ld_rr, ('l', 'l')),  # LDrr_ll (nop?)
-            110: (self._ld_r_hlm, ('l',)),  # LDrHLm_l
-            111: (self._ld_rr, ('l', 'a')),  # LDrr_la
-            112: (self._ld_hlm_r, ('b',)),  # LDHLmr_b
-            113: (self._ld_hlm_r, ('c',)),  # LDHLmr_c
-            114: (self._ld_hlm_r, ('d',)),  # LDHLmr_d
-            115: (self._ld_hlm_r, ('e',)),  # LDHLmr_e
-            116: (self._ld_hlm_r, ('h',)),  # LDHLmr_h
-            117: (self._ld_hlm_r, ('l',)),  # LDHLmr_l
-            118: (self._raise_opcode_unimplemented, ()),  # HALT
-            119: (self._ld_hlm_r, ('a',)),  # LDHLmr_a
-            120: (self._ld_rr, ('a', 'b')),  # LDrr_ab
-            121: (self._ld_rr, ('a', 'c')),  # LDrr_ac
-            122: (self._ld_rr, ('a', 'd')),  # LDrr_ad
-            123: (self._ld_rr, ('a', 'e')),  # LDrr_ae
-            124: (self._ld_rr, ('a', 'h')),  # LDrr_ah
-            125: (self._ld_rr, ('a', 'l')),  # LDrr_al
-            126: (self._ld_r_hlm, ('a',)),  # LDrHLm_a
-            127: (self._ld_rr, ('a', 'a')),  # LDrr_aa (nop?)
-            128: (self._add_a_n, ('b',)),  # ADDr_b
-            129: (self._add_a_n, ('c',)),  # ADDr_c
-            130: (self._add_a_n, ('d',)),  # ADDr_d
-            131: (self._add_a_n, ('e',)),  # ADDr_e
-            132: (self._add_a_n, ('h',)),  # ADDr_h
-            133: (self._add_a_n, ('l',)),  # ADDr_l
-            134: (self._raise_opcode_unimplemented, ()),  # ADDHL
-            135: (self._add_a_n, ('a',)),  # ADDr_a
-            136: (self._raise_opcode_unimplemented, ()),  # ADCr_b
-            137: (self._raise_opcode_unimplemented, ()),  # ADCr_c
-            138: (self._raise_opcode_unimplemented, ()),  # ADCr_d
-            139: (self._raise_opcode_unimplemented, ()),  # ADCr_e
-            140: (self._raise_opcode_unimplemented, ()),  # ADCr_h
-            141: (self._raise_opcode_unimplemented, ()),  # ADCr_l
-            142: (self._raise_opcode_unimplemented, ()),  # ADCHL
-            143: (self._raise_opcode_unimplemented, ()),  # ADCr_a
-            144: (self._sub_n, ('b',)),  # SUBr_b
-            145: (self._sub_n, ('c',)),  # SUBr_c
-            146: (self._sub_n, ('d',)),  # SUBr_d
-            147: (self._sub_n, ('e',)),  # SUBr_e
-            148: (self._sub_n, ('h',)),  # SUBr_h
-            149: (self._sub_n, ('l',)),  # SUBr_l
-            150: (self._raise_opcode_unimplemented, ()),  # SUBHL
-            151: (self._sub_n, ('a',)),  # SUBr_a
-            152: (self._sub_a_n, ('b',)),  # SBCr_b
-            153: (self._sub_a_n, ('c',)),  # SBCr_c
-            154: (self._sub_a_n, ('d',)),  # SBCr_d
-            155: (self._sub_a_n, ('e',)),  # SBCr_e
-            156: (self._sub_a_n, ('h',)),  # SBCr_h
-            157: (self._sub_a_n, ('l',)),  # SBCr_l
-            158: (self._raise_opcode_unimplemented, ()),  # SBCHL
-            159: (self._sub_a_n, ('a',)),  # SBCr_a
-            160: (self._and_n, ('b',)),  # ANDr_b
-            161: (self._and_n, ('c',)),  # ANDr_c
-            162: (self._and_n, ('d',)),  # ANDr_d
-            163: (self._and_n, ('e',)),  # ANDr_e
-            164: (self._and_n, ('h',)),  # ANDr_h
-            165: (self._and_n, ('l',)),  # ANDr_l
-            166: (self._and_n, ('hl',)),  # ANDHL
-            167: (self._and_n, ('a',)),  # ANDr_a
-            168: (self._xor_a_n, ('b',)),  # XORr_b
-            169: (self._xor_a_n, ('c',)),  # XORr_c
-            170: (self._xor_a_n, ('d',)),  # XORr_d
-            171: (self._xor_a_n, ('e',)),  # XORr_e
-            172: (self._xor_a_n, ('h',)),  # XORr_h
-            173: (self._xor_a_n, ('l',)),  # XORr_l
-            174: (self._raise_opcode_unimplemented, ()),  # XORHL
-            175: (self._xor_a_n, ('a',)),  # XORr_a
-            176: (self._or_n, ('b',)),  # ORr_b
-            177: (self._or_n, ('c',)),  # ORr_c
-            178: (self._or_n, ('d',)),  # ORr_d
-            179: (self._or_n, ('e',)),  # ORr_e
-            180: (self._or_n, ('h',)),  # ORr_h
-            181: (self._or_n, ('l',)),  # ORr_l
-            182: (self._raise_opcode_unimplemented, ()),  # ORHL
-            183: (self._or_n, ('a',)),  # ORr_a
-            184: (self._cp_n, ('b',)),  # CPr_b
-            185: (self._cp_n, ('c',)),  # CPr_c
-            186: (self._cp_n, ('d',)),  # CPr_d
-            187: (self._cp_n, ('e',)),  # CPr_e
-            188: (self._cp_n, ('h',)),  # CPr_h
-            189: (self._cp_n, ('l',)),  # CPr_l
-            190: (self._raise_opcode_unimplemented, ()),  # CPHL
-            191: (self._cp_n, ('a',)),  # CPr_a
-            192: (self._ret_f, (FLAG['zero'], 0x00)),  # RETNZ
-            193: (self._pop_nn, ('b', 'c')),  # POPBC
-            194: (self._jp_cc_nn, (FLAG['zero'], 0x00)),  # JPNZnn
-            195: (self._jp_nn, ()),  # JPnn
-            196: (self._raise_opcode_unimplemented, ()),  # CALLNZnn
-            197: (self._push_nn, ('b', 'c')),  # PUSHBC
-            198: (self._raise_opcode_unimplemented, ()),  # ADDn
-            199: (self._rst_n, (0x00,)),  # RST00
-            200: (self._ret_f, (FLAG['zero'], FLAG['zero'])),  # RETZ
-            201: (self._ret, ()),  # RET
-            202: (self._jp_cc_nn, (FLAG['zero'], FLAG['zero'])),  # JPZnn
-            203: (self._call_cb_op, ()),  # MAPcb
-            204: (self._raise_opcode_unimplemented, ()),  # CALLZnn
-            205: (self._call_nn, ()),  # CALLnn
-            206: (self._raise_opcode_unimplemented, ()),  # ADCn
-            207: (self._rst_n, (0x08,)),  # RST08
-            208: (self._ret_f, (FLAG['carry'], 0x00)),  # RETNC
-            209: (self._pop_nn, ('d', 'e')),  # POPDE
-            210: (self._jp_cc_nn, (FLAG['carry'], 0x00)),  # JPNCnn
-            211: (self._raise_opcode_unimplemented, ()),  # XX
-            212: (self._raise_opcode_unimplemented, ()),  # CALLNCnn
-            213: (self._push_nn, ('d', 'e')),  # PUSHDE
-            214: (self._raise_opcode_unimplemented, ()),  # SUBn
-            215: (self._rst_n, (FLAG['carry'],)),  # RST10
-            216: (self._ret_f, (FLAG['carry'], FLAG['carry'])),  # RETC
-            217: (self._reti, ()),  # RETI
-            218: (self._jp_cc_nn, (FLAG['carry'], FLAG['carry'])),  # JPCnn
-            219: (self._raise_opcode_unimplemented, ()),  # XX
-            220: (self._raise_opcode_unimplemented, ()),  # CALLCnn
-            221: (self._raise_opcode_unimplemented, ()),  # XX
-            222: (self._raise_opcode_unimplemented, ()),  # SBCn
-            223: (self._rst_n, (0x18,)),  # RST18
-            224: (self._ldh_n_a, ()),  # LDIOnA
-            225: (self._pop_nn, ('h', 'l')),  # POPHL
-            226: (self._ld_c_a, ()),  # LDIOCA
-            227: (self._raise_opcode_unimplemented, ()),  # XX
-            228: (self._raise_opcode_unimplemented, ()),  # XX
-            229: (self._push_nn, ('h', 'l')),  # PUSHHL
-            230: (self._and_n, ('pc',)),  # ANDn
-            231: (self._rst_n, (FLAG['half-carry'],)),  # RST20
-            232: (self._add_sp_n, ()),  # ADDSPn
-            233: (self._raise_opcode_unimplemented, ()),  # JPHL
-            234: (self._ld_nn_a, ()),  # LD nn A
-            235: (self._raise_opcode_unimplemented, ()),  # XX
-            236: (self._raise_opcode_unimplemented, ()),  # XX
-            237: (self._raise_opcode_unimplemented, ()),  # XX
-            238: (self._raise_opcode_unimplemented, ()),  # ORn
-            239: (self._rst_n, (0x28)),  # RST28
-            240: (self._ldh_a_n, ()),  # LD AIO n
-            241: (self._pop_nn, ('a', 'f')),  # POPAF
-            242: (self._ld_a_c, ()),  # LDAIOC
-            243: (self._di, ()),  # DI
-            244: (self._raise_opcode_unimplemented, ()),  # XX
-            245: (self._push_nn, ('a', 'f')),  # PUSHAF
-            246: (self._xor_n, ()),  # XORn
-            247: (self._rst_n, (0x30,)),  # RST30
-            248: (self._ld_hl_sp_n, ()),  # LD HL SP+n
-            249: (self._ld_sp_hl, ()),  # LS SP HL
-            250: (self._ld_a_nn, ()),  # LD A nn
-            251: (self._ei, ()),  # EI
-            252: (self._raise_opcode_unimplemented, ()),  # XX
-            253: (self._raise_opcode_unimplemented, ()),  # XX
-            254: (self._cp_n, ('pc',)),  # CPn
-            255: (self._rst_n, (0x38,)),  # RST38
-        }
-
-        self.cb_map = {
-            0: (self._rlc_n, ['b']),  # RLCr_b
-            1: (self._rlc_n, ['c']),  # RLCr_c
-            2: (self._rlc_n, ['d']),  # RLCr_d
-            3: (self._rlc_n, ['e']),  # RLCr_e
-            4: (self._rlc_n, ['h']),  # RLCr_h
-            5: (self._rlc_n, ['l']),  # RLCr_l
-            6: (self._raise_cb_op_unimplemented, ['rlchl']),  # RLCHL
-            7: (self._rlc_n, ['a']),  # RLCr_a
-            8: (self._raise_cb_op_unimplemented, ['rrcr_b']),  # RRCr_b
-            9: (self._raise_cb_op_unimplemented, ['rrcr_c']),  # RRCr_c
-            10: (self._raise_cb_op_unimplemented, ['rrcr_d']),  # RRCr_d
-            11: (self._raise_cb_op_unimplemented, ['rrcr_e']),  # RRCr_e
-            12: (self._raise_cb_op_unimplemented, ['rrcr_h']),  # RRCr_h
-            13: (self._raise_cb_op_unimplemented, ['rrcr_l']),  # RRCr_l
-            14: (self._raise_cb_op_unimplemented, ['rrchl']),  # RRCHL
-            15: (self._raise_cb_op_unimplemented, ['rrcr_a']),  # RRCr_a
-            16: (self._raise_cb_op_unimplemented, ['rlr_b']),  # RLr_b
-            17: (self._raise_cb_op_unimplemented, ['rlr_c']),  # RLr_c
-            18: (self._raise_cb_op_unimplemented, ['rlr_d']),  # RLr_d
-            19: (self._raise_cb_op_unimplemented, ['rlr_e']),  # RLr_e
-            20: (self._raise_cb_op_unimplemented, ['rlr_h']),  # RLr_h
-            21: (self._raise_cb_op_unimplemented, ['rlr_l']),  # RLr_l
-            22: (self._raise_cb_op_unimplemented, ['rlhl']),  # RLHL
-            23: (self._raise_cb_op_unimplemented, ['rlr_a']),  # RLr_a
-            24: (self._raise_cb_op_unimplemented, ['rrr_b']),  # RRr_b
-            25: (self._raise_cb_op_unimplemented, ['rrr_c']),  # RRr_c
-            26: (self._raise_cb_op_unimplemented, ['rrr_d']),  # RRr_d
-            27: (self._raise_cb_op_unimplemented, ['rrr_e']),  # RRr_e
-            28: (self._raise_cb_op_unimplemented, ['rrr_h']),  # RRr_h
-            29: (self._raise_cb_op_unimplemented, ['rrr_l']),  # RRr_l
-            30: (self._raise_cb_op_unimplemented, ['rrhl']),  # RRHL
-            31: (self._raise_cb_op_unimplemented, ['rrr_a']),  # RRr_a
-            32: (self._raise_cb_op_unimplemented, ['slar_b']),  # SLAr_b
-            33: (self._raise_cb_op_unimplemented, ['slar_c']),  # SLAr_c
-            34: (self._raise_cb_op_unimplemented, ['slar_d']),  # SLAr_d
-            35: (self._raise_cb_op_unimplemented, ['slar_e']),  # SLAr_e
-            36: (self._raise_cb_op_unimplemented, ['slar_h']),  # SLAr_h
-            37: (self._raise_cb_op_unimplemented, ['slar_l']),  # SLAr_l
-            38: (self._raise_cb_op_unimplemented, ['xx']),  # XX
-            39: (self._raise_cb_op_unimplemented, ['slar_a']),  # SLAr_a
-            40: (self._raise_cb_op_unimplemented, ['srar_b']),  # SRAr_b
-            41: (self._raise_cb_op_unimplemented, ['srar_c']),  # SRAr_c
-            42: (self._raise_cb_op_unimplemented, ['srar_d']),  # SRAr_d
-            43: (self._raise_cb_op_unimplemented, ['srar_e']),  # SRAr_e
-            44: (self._raise_cb_op_unimplemented, ['srar_h']),  # SRAr_h
-            45: (self._raise_cb_op_unimplemented, ['srar_l']),  # SRAr_l
-            46: (self._raise_cb_op_unimplemented, ['xx']),  # XX
-            47: (self._raise_cb_op_unimplemented, ['srar_a']),  # SRAr_a
-            48: (self._swap_n, ['b']),  # SWAPr_b
-            49: (self._swap_n, ['c']),  # SWAPr_c
-            50: (self._swap_n, ['d']),  # SWAPr_d
-            51: (self._swap_n, ['e']),  # SWAPr_e
-            52: (self._swap_n, ['h']),  # SWAPr_h
-            53: (self._swap_n, ['l']),  # SWAPr_l
-            54: (self._raise_cb_op_unimplemented, ['xx']),  # XX
-            55: (self._swap_n, ['a']),  # SWAPr_a
-            56: (self._raise_cb_op_unimplemented, ['srlr_b']),  # SRLr_b
-            57: (self._raise_cb_op_unimplemented, ['srlr_c']),  # SRLr_c
-            58: (self._raise_cb_op_unimplemented, ['srlr_d']),  # SRLr_d
-            59: (self._raise_cb_op_unimplemented, ['srlr_e']),  # SRLr_e
-            60: (self._raise_cb_op_unimplemented, ['srlr_h']),  # SRLr_h
-            61: (self._raise_cb_op_unimplemented, ['srlr_l']),  # SRLr_l
-            62: (self._raise_cb_op_unimplemented, ['xx']),  # XX
-            63: (self._raise_cb_op_unimplemented, ['srlr_a']),  # SRLr_a
-            64: (self._raise_cb_op_unimplemented, ['bit0b']),  # BIT0b
-            65: (self._raise_cb_op_unimplemented, ['bit0c']),  # BIT0c
-            66: (self._raise_cb_op_unimplemented, ['bit0d']),  # BIT0d
-            67: (self._raise_cb_op_unimplemented, ['bit0e']),  # BIT0e
-            68: (self._raise_cb_op_unimplemented, ['bit0h']),  # BIT0h
-            69: (self._raise_cb_op_unimplemented, ['bit0l']),  # BIT0l
-            70: (self._raise_cb_op_unimplemented, ['bit0m']),  # BIT0m
-            71: (self._raise_cb_op_unimplemented, ['bit0a']),  # BIT0a
-            72: (self._raise_cb_op_unimplemented, ['bit1b']),  # BIT1b
-            73: (self._raise_cb_op_unimplemented, ['bit1c']),  # BIT1c
-            74: (self._raise_cb_op_unimplemented, ['bit1d']),  # BIT1d
-            75: (self._raise_cb_op_unimplemented, ['bit1e']),  # BIT1e
-            76: (self._raise_cb_op_unimplemented, ['bit1h']),  # BIT1h
-            77: (self._raise_cb_op_unimplemented, ['bit1l']),  # BIT1l
-            78: (self._raise_cb_op_unimplemented, ['bit1m']),  # BIT1m
-            79: (self._raise_cb_op_unimplemented, ['bit1a']),  # BIT1a
-            80: (self._raise_cb_op_unimplemented, ['bit2b']),  # BIT2b
-            81: (self._raise_cb_op_unimplemented, ['bit2c']),  # BIT2c
-            82: (self._raise_cb_op_unimplemented, ['bit2d']),  # BIT2d
-            83: (self._raise_cb_op_unimplemented, ['bit2e']),  # BIT2e
-            84: (self._raise_cb_op_unimplemented, ['bit2h']),  # BIT2h
-            85: (self._raise_cb_op_unimplemented, ['bit2l']),  # BIT2l
-            86: (self._raise_cb_op_unimplemented, ['bit2m']),  # BIT2m
-            87: (self._raise_cb_op_unimplemented, ['bit2a']),  # BIT2a
-            88: (self._raise_cb_op_unimplemented, ['bit3b']),  # BIT3b
-            89: (self._raise_cb_op_unimplemented, ['bit3c']),  # BIT3c
-            90: (self._raise_cb_op_unimplemented, ['bit3d']),  # BIT3d
-            91: (self._raise_cb_op_unimplemented, ['bit3e']),  # BIT3e
-            92: (self._raise_cb_op_unimplemented, ['bit3h']),  # BIT3h
-            93: (self._raise_cb_op_unimplemented, ['bit3l']),  # BIT3l
-            94: (self._raise_cb_op_unimplemented, ['bit3m']),  # BIT3m
-            95: (self._raise_cb_op_unimplemented, ['bit3a']),  # BIT3a
-            96: (self._raise_cb_op_unimplemented, ['bit4b']),  # BIT4b
-            97: (self._raise_cb_op_unimplemented, ['bit4c']),  # BIT4c
-            98: (self._raise_cb_op_unimplemented, ['bit4d']),  # BIT4d
-            99: (self._raise_cb_op_unimplemented, ['bit4e']),  # BIT4e
-            100: (self._raise_cb_op_unimplemented, ['bit4h']),  # BIT4h
-            101: (self._raise_cb_op_unimplemented, ['bit4l']),  # BIT4l
-            102: (self._raise_cb_op_unimplemented, ['bit4m']),  # BIT4m
-            103: (self._raise_cb_op_unimplemented, ['bit4a']),  # BIT4a
-            104: (self._raise_cb_op_unimplemented, ['bit5b']),  # BIT5b
-            105: (self._raise_cb_op_unimplemented, ['bit5c']),  # BIT5c
-            106: (self._raise_cb_op_unimplemented, ['bit5d']),  # BIT5d
-            107: (self._raise_cb_op_unimplemented, ['bit5e']),  # BIT5e
-            108: (self._raise_cb_op_unimplemented, ['bit5h']),  # BIT5h
-            109: (self._raise_cb_op_unimplemented, ['bit5l']),  # BIT5l
-            110: (self._raise_cb_op_unimplemented, ['bit5m']),  # BIT5m
-            111: (self._raise_cb_op_unimplemented, ['bit5a']),  # BIT5a
-            112: (self._raise_cb_op_unimplemented, ['bit6b']),  # BIT6b
-            113: (self._raise_cb_op_unimplemented, ['bit6c']),  # BIT6c
-            114: (self._raise_cb_op_unimplemented, ['bit6d']),  # BIT6d
-            115: (self._raise_cb_op_unimplemented, ['bit6e']),  # BIT6e
-            116: (self._raise_cb_op_unimplemented, ['bit6h']),  # BIT6h
-            117: (self._raise_cb_op_unimplemented, ['bit6l']),  # BIT6l
-            118: (self._raise_cb_op_unimplemented, ['bit6m']),  # BIT6m
-            119: (self._raise_cb_op_unimplemented, ['bit6a']),  # BIT6a
-            120: (self._raise_cb_op_unimplemented, ['bit7b']),  # BIT7b
-            121: (self._raise_cb_op_unimplemented, ['bit7c']),  # BIT7c
-            122: (self._raise_cb_op_unimplemented, ['bit7d']),  # BIT7d
-            123: (self._raise_cb_op_unimplemented, ['bit7e']),  # BIT7e
-            124: (self._raise_cb_op_unimplemented, ['bit7h']),  # BIT7h
-            125: (self._raise_cb_op_unimplemented, ['bit7l']),  # BIT7l
-            126: (self._raise_cb_op_unimplemented, ['bit7m']),  # BIT7m
-            127: (self._raise_cb_op_unimplemented, ['bit7a']),  # BIT7a
-            128: (self._raise_cb_op_unimplemented, ['res0b']),  # RES0b
-            129: (self._raise_cb_op_unimplemented, ['res0c']),  # RES0c
-            130: (self._raise_cb_op_unimplemented, ['res0d']),  # RES0d
-            131: (self._raise_cb_op_unimplemented, ['res0e']),  # RES0e
-            132: (self._raise_cb_op_unimplemented, ['res0h']),  # RES0h
-            133: (self._raise_cb_op_unimplemented, ['res0l']),  # RES0l
-            134: (self._raise_cb_op_unimplemented, ['res0m']),  # RES0m
-            135: (self._raise_cb_op_unimplemented, ['res0a']),  # RES0a
-            136: (self._raise_cb_op_unimplemented, ['res1b']),  # RES1b
-            137: (self._raise_cb_op_unimplemented, ['res1c']),  # RES1c
-            138: (self._raise_cb_op_unimplemented, ['res1d']),  # RES1d
-            139: (self._raise_cb_op_unimplemented, ['res1e']),  # RES1e
-            140: (self._raise_cb_op_unimplemented, ['res1h']),  # RES1h
-            141: (self._raise_cb_op_unimplemented, ['res1l']),  # RES1l
-            142: (self._raise_cb_op_unimplemented, ['res1m']),  # RES1m
-            143: (self._raise_cb_op_unimplemented, ['res1a']),  # RES1a
-            144: (self._raise_cb_op_unimplemented, ['res2b']),  # RES2b
-            145: (self._raise_cb_op_unimplemented, ['res2c']),  # RES2c
-            146: (self._raise_cb_op_unimplemented, ['res2d']),  # RES2d
-            147: (self._raise_cb_op_unimplemented, ['res2e']),  # RES2e
-            148: (self._raise_cb_op_unimplemented, ['res2h']),  # RES2h
-            149: (self._raise_cb_op_unimplemented, ['res2l']),  # RES2l
-            150: (self._raise_cb_op_unimplemented, ['res2m']),  # RES2m
-            151: (self._raise_cb_op_unimplemented, ['res2a']),  # RES2a
-            152: (self._raise_cb_op_unimplemented, ['res3b']),  # RES3b
-            153: (self._raise_cb_op_unimplemented, ['res3c']),  # RES3c
-            154: (self._raise_cb_op_unimplemented, ['res3d']),  # RES3d
-            155: (self._raise_cb_op_unimplemented, ['res3e']),  # RES3e
-            156: (self._raise_cb_op_unimplemented, ['res3h']),  # RES3h
-            157: (self._raise_cb_op_unimplemented, ['res3l']),  # RES3l
-            158: (self._raise_cb_op_unimplemented, ['res3m']),  # RES3m
-            159: (self._raise_cb_op_unimplemented, ['res3a']),  # RES3a
-            160: (self._raise_cb_op_unimplemented, ['res4b']),  # RES4b
-            161: (self._raise_cb_op_unimplemented, ['res4c']),  # RES4c
-            162: (self._raise_cb_op_unimplemented, ['res4d']),  # RES4d
-            163: (self._raise_cb_op_unimplemented, ['res4e']),  # RES4e
-            164: (self._raise_cb_op_unimplemented, ['res4h']),  # RES4h
-            165: (self._raise_cb_op_unimplemented, ['res4l']),  # RES4l
-            166: (self._raise_cb_op_unimplemented, ['res4m']),  # RES4m
-            167: (self._raise_cb_op_unimplemented, ['res4a']),  # RES4a
-            168: (self._raise_cb_op_unimplemented, ['res5b']),  # RES5b
-            169: (self._raise_cb_op_unimplemented, ['res5c']),  # RES5c
-            170: (self._raise_cb_op_unimplemented, ['res5d']),  # RES5d
-            171: (self._raise_cb_op_unimplemented, ['res5e']),  # RES5e
-            172: (self._raise_cb_op_unimplemented, ['res5h']),  # RES5h
-            173: (self._raise_cb_op_unimplemented, ['res5l']),  # RES5l
-            174: (self._raise_cb_op_unimplemented, ['res5m']),  # RES5m
-            175: (self._raise_cb_op_unimplemented, ['res5a']),  # RES5a
-            176: (self._raise_cb_op_unimplemented, ['res6b']),  # RES6b
-            177: (self._raise_cb_op_unimplemented, ['res6c']),  # RES6c
-            178: (self._raise_cb_op_unimplemented, ['res6d']),  # RES6d
-            179: (self._raise_cb_op_unimplemented, ['res6e']),  # RES6e
-            180: (self._raise_cb_op_unimplemented, ['res6h']),  # RES6h
-            181: (self._raise_cb_op_unimplemented, ['res6l']),  # RES6l
-            182: (self._raise_cb_op_unimplemented, ['res6m']),  # RES6m
-            183: (self._raise_cb_op_unimplemented, ['res6a']),  # RES6a
-            184: (self._raise_cb_op_unimplemented, ['res7b']),  # RES7b
-            185: (self._raise_cb_op_unimplemented, ['res7c']),  # RES7c
-            186: (self._raise_cb_op_unimplemented, ['res7d']),  # RES7d
-            187: (self._raise_cb_op_unimplemented, ['res7e']),  # RES7e
-            188: (self._raise_cb_op_unimplemented, ['res7h']),  # RES7h
-            189: (self._raise_cb_op_unimplemented, ['res7l']),  # RES7l
-            190: (self._raise_cb_op_unimplemented, ['res7m']),  # RES7m
-            191: (self._raise_cb_op_unimplemented, ['res7a']),  # RES7a
-            192: (self._raise_cb_op_unimplemented, ['set0b']),  # SET0b
-            193: (self._raise_cb_op_unimplemented, ['set0c']),  # SET0c
-            194: (self._raise_cb_op_unimplemented, ['set0d']),  # SET0d
-            195: (self._raise_cb_op_unimplemented, ['set0e']),  # SET0e
-            196: (self._raise_cb_op_unimplemented, ['set0h']),  # SET0h
-            197: (self._raise_cb_op_unimplemented, ['set0l']),  # SET0l
-            198: (self._raise_cb_op_unimplemented, ['set0m']),  # SET0m
-            199: (self._raise_cb_op_unimplemented, ['set0a']),  # SET0a
-            200: (self._raise_cb_op_unimplemented, ['set1b']),  # SET1b
-            201: (self._raise_cb_op_unimplemented, ['set1c']),  # SET1c
-            202: (self._raise_cb_op_unimplemented, ['set1d']),  # SET1d
-            203: (self._raise_cb_op_unimplemented, ['set1e']),  # SET1e
-            204: (self._raise_cb_op_unimplemented, ['set1h']),  # SET1h
-            205: (self._raise_cb_op_unimplemented, ['set1l']),  # SET1l
-            206: (self._raise_cb_op_unimplemented, ['set1m']),  # SET1m
-            207: (self._raise_cb_op_unimplemented, ['set1a']),  # SET1a
-            208: (self._raise_cb_op_unimplemented, ['set2b']),  # SET2b
-            209: (self._raise_cb_op_unimplemented, ['set2c']),  # SET2c
-            210: (self._raise_cb_op_unimplemented, ['set2d']),  # SET2d
-            211: (self._raise_cb_op_unimplemented, ['set2e']),  # SET2e
-            212: (self._raise_cb_op_unimplemented, ['set2h']),  # SET2h
-            213: (self._raise_cb_op_unimplemented, ['set2l']),  # SET2l
-            214: (self._raise_cb_op_unimplemented, ['set2m']),  # SET2m
-            215: (self._raise_cb_op_unimplemented, ['set2a']),  # SET2a
-            216: (self._raise_cb_op_unimplemented, ['set3b']),  # SET3b
-            217: (self._raise_cb_op_unimplemented, ['set3c']),  # SET3c
-            218: (self._raise_cb_op_unimplemented, ['set3d']),  # SET3d
-            219: (self._raise_cb_op_unimplemented, ['set3e']),  # SET3e
-            220: (self._raise_cb_op_unimplemented, ['set3h']),  # SET3h
-            221: (self._raise_cb_op_unimplemented, ['set3l']),  # SET3l
-            222: (self._raise_cb_op_unimplemented, ['set3m']),  # SET3m
-            223: (self._raise_cb_op_unimplemented, ['set3a']),  # SET3a
-            224: (self._raise_cb_op_unimplemented, ['set4b']),  # SET4b
-            225: (self._raise_cb_op_unimplemented, ['set4c']),  # SET4c
-            226: (self._raise_cb_op_unimplemented, ['set4d']),  # SET4d
-            227: (self._raise_cb_op_unimplemented, ['set4e']),  # SET4e
-            228: (self._raise_cb_op_unimplemented, ['set4h']),  # SET4h
-            229: (self._raise_cb_op_unimplemented, ['set4l']),  # SET4l
-            230: (self._raise_cb_op_unimplemented, ['set4m']),  # SET4m
-            231: (self._raise_cb_op_unimplemented, ['set4a']),  # SET4a
-            232: (self._raise_cb_op_unimplemented, ['set5b']),  # SET5b
-            233: (self._raise_cb_op_unimplemented, ['set5c']),  # SET5c
-            234: (self._raise_cb_op_unimplemented, ['set5d']),  # SET5d
-            235: (self._raise_cb_op_unimplemented, ['set5e']),  # SET5e
-            236: (self._raise_cb_op_unimplemented, ['set5h']),  # SET5h
-            237: (self._raise_cb_op_unimplemented, ['set5l']),  # SET5l
-            238: (self._raise_cb_op_unimplemented, ['set5m']),  # SET5m
-            239: (self._raise_cb_op_unimplemented, ['set5a']),  # SET5a
-            240: (self._raise_cb_op_unimplemented, ['set6b']),  # SET6b
-            241: (self._raise_cb_op_unimplemented, ['set6c']),  # SET6c
-            242: (self._raise_cb_op_unimplemented, ['set6d']),  # SET6d
-            243: (self._raise_cb_op_unimplemented, ['set6e']),  # SET6e
-            244: (self._raise_cb_op_unimplemented, ['set6h']),  # SET6h
-            245: (self._raise_cb_op_unimplemented, ['set6l']),  # SET6l
-            246: (self._raise_cb_op_unimplemented, ['set6m']),  # SET6m
-            247: (self._raise_cb_op_unimplemented, ['set6a']),  # SET6a
-            248: (self._raise_cb_op_unimplemented, ['set7b']),  # SET7b
-            249: (self._raise_cb_op_unimplemented, ['set7c']),  # SET7c
-            250: (self._raise_cb_op_unimplemented, ['set7d']),  # SET7d
-            251: (self._raise_cb_op_unimplemented, ['set7e']),  # SET7e
-            252: (self._raise_cb_op_unimplemented, ['set7h']),  # SET7h
-            253: (self._raise_cb_op_unimplemented, ['set7l']),  # SET7l
-            254: (self._raise_cb_op_unimplemented, ['set7m']),  # SET7m
-            255: (self._raise_cb_op_unimplemented, ['set7a']),  # SET7a
-        }
+        # 16-bit registers stored as two 8-bit registers
+        # 15..8   7..0
+        self.a, self.f = 1, 0
+        self.b, self.c = 0, 0x13
+        self.d, self.e = 0, 216
+        self.h, self.l = 0, 0
 
-    def execute_next_operation(self):
-        """Execute the next operation."""
-        global my_counter
-        my_counter += 1
-        op = self.read8(self.registers['pc'])
-        # print('--------------------')
-        # print("registers before exec:", self.registers)
-        self.registers['pc'] += 1
-        self.registers['pc'] &= 65535   # mask to 16-bits
-        instruction = self.opcode_map[op]
+        # Interrupts enabled/disabled
+        self.ime = 0
+        self.halted = 0
 
-        # print("op:", op, 'clock:', self.clock['m'], 'instr_cnt', my_counter)
-        opcode, args = instruction[0], instruction[1]
+        # 16-bit registers (program counter, stack pointer)
+        self.pc, self.sp = 0x100, 0xFFFE
 
-        # if op == 254:
-        #     pdb.set_trace()
+        # Registers saved by RST and restored by RETI: a b c d e f h l
+        self.rsv = (0,) * 8
 
-        opcode(*args)
-        self._inc_clock()
-
-        # print("registers after exec:", self.registers)
+    def execute_next_operation(self):
+        """Execute the next operation."""
+        if self.halted:
+            self.clock_m += 1
+            return
+        op = self.mem[self.pc]
+        self.pc = (self.pc + 1) & 65535
+        try:
+            self.OPCODES[op](self)
+        except _CpuHalted:
+            pass
+        self.clock_m += OPCODE_CYCLES[op]
+
+    def run_until(self, target_cycles):
+        """Execute instructions until clock_m reaches target_cycles.
+
+        Same as calling execute_next_operation in a loop, with the
+        lookups it repeats hoisted into locals.  Handlers still read and
+        write self.pc, so the local copy is only used for the fetch and
+        is refreshed after every handler.
+
+        Runs of simple one-byte opcodes in ROM execute as one fused block
+        function (see _compile_block), built the first time pc reaches
+        them often enough (HOT_BLOCK_VISITS); blocks[pc] is None until
+        then and False if there is no block there.  A block can
+        overshoot target_cycles by a few cycles.
+
+        HALT leaves the loop by raising _CpuHalted, so the loop itself
+        never has to check for it.
+        """
+        if self.halted:
+            self._idle_until(target_cycles)
+            return
+        mem = self.mem
+        opcodes = self.OPCODES
+        cycles = OPCODE_CYCLES
+        blocks = self.blocks
+        visits = self.block_visits
+        pc = self.pc
+        try:
+            while self.clock_m < target_cycles:
+                block = blocks[pc]
+                if block is None:
+                    seen = visits[pc] + 1
+                    if seen < HOT_BLOCK_VISITS:
+                        visits[pc] = seen
+                    else:
+                        visits[pc] = 0
+                        block = blocks[pc] = _compile_block(mem, pc)
+                if block:
+                    block(self)
+                    pc = self.pc
+                    continue
+                op = mem[pc]
+                self.pc = (pc + 1) & 65535
+                opcodes[op](self)
+                pc = self.pc
+                self.clock_m += cycles[op]
+        except _CpuHalted:
+            self.clock_m += cycles[op]
+            self._idle_until(target_cycles)
 
     def execute_specific_instruction(self, op):
         """Execute an instruction (for testing)."""
-        instruction = self.opcode_map[op]
-        print(instruction)
-        opcode, args = instruction[0], instruction[1]
-        opcode(*args)
-        self._inc_clock()
+        self.OPCODES[op](self)
+        self.clock_m += OPCODE_CYCLES[op]
+
+    @property
+    def registers(self):
+        """Return a snapshot of the register set (for debugging)."""
+        return {reg: getattr(self, reg) for reg in REGISTER_NAMES}
 
     def reset(self):
         """Reset registers."""
-        for k in self.clock.items():
-            self.clock[k] = 0
-        for k in self.registers.items():
-            self.registers[k] = 0
+        self.clock_m = 0
+        self.halted = 0
+        self.a = self.f = self.b = self.c = 0
+        self.d = self.e = self.h = self.l = 0
+        self.pc = self.sp = self.ime = 0
+
+    def set_system_interface(self, sys_interface):
+        """Set the system interface.
+
+        Reads have no side effects, so they index the memory buffer
+        directly instead of going through the interface; VRAM writes still
+        go through it so tile updates reach the GPU.
+        """
+        self.sys_interface = sys_interface
+        self.mem = sys_interface.memory.memory
+        self._reset_blocks()
 
     def read8(self, address):
         """Return a byte from memory at address."""
-        return self.sys_interface.read_byte(address)
+        return self.mem[address]
 
     def write8(self, address, val):
-        """Write a byte to memory at address."""
-        self.sys_interface.write_byte(address, val)
+        """Write a byte to memory at address.
+
+        Only VRAM writes have a side effect (the GPU tile update), so any
+        other address is stored straight into the buffer.
+        """
+        if address < ROM_END:
+            self.mem[address] = val
+            self._invalidate_blocks(address)
+        elif address <= 0xA000:
+            self.sys_interface.write_byte(address, val)
+        else:
+            self.mem[address] = val
 
     def read16(self, address):
         """Return a word(16-bits) from memory."""
-        return self.sys_interface.read_word(address)
+        mem = self.mem
+        return mem[address] + (mem[address + 1] << 8)
 
     def write16(self, address, val):
         """Write a word to memory at address."""
-        self.sys_interface.write_word(address, val)
+        mem = self.mem
+        mem[address] = val & 255
+        mem[address + 1] = val >> 8
+        if address < ROM_END:
+            self._invalidate_blocks(address + 1)
+
+    def _reset_blocks(self):
+        """Forget every fused block (see run_until)."""
+        self.blocks = [None] * ROM_END + [False] * (0x10000 - ROM_END)
+        self.block_visits = bytearray(0x10000)
+
+    def _invalidate_blocks(self, address):
+        """Forget fused blocks that may include the byte at address."""
+        blocks = self.blocks
+        for start in range(max(0, address - MAX_BLOCK_LEN + 1), address + 1):
+            blocks[start] = None
 
     def _call_cb_op(self):
-        """Call an opcode in the cb map."""
-        i = self.read8(self.registers['pc'])
-        self.registers['pc'] += 1
-        self.registers['pc'] &= 65535
-        op, args = self.cb_map[i]
-        op(*args)
+        """Call an opcode in the cb table."""
+        i = self.mem[self.pc]
+        self.pc = (self.pc + 1) & 65535
+        self.CB_OPCODES[i](self)
+        self.clock_m += CB_CYCLES[i]
 
-    def _inc_clock(self):
-        """Increment clock registers."""
-        self.clock['m'] += self.registers['m']
+    def _idle_until(self, target_cycles):
+        """Let the clock run to target_cycles while halted.
 
-    def _toggle_flag(self, flag_value):
-        self.registers['f'] |= flag_value
+        Nothing raises interrupts yet, so a halted cpu stays halted.
+        """
+        if self.clock_m < target_cycles:
+            self.clock_m = target_cycles
 
-    @staticmethod
-    def _raise_opcode_unimplemented():
-        print("counter:", my_counter)
-        raise Exception("Opcode unimplemented!")
+    def _raise_opcode_unimplemented(self, op):
+        raise NotImplementedError("opcode 0x%02X unimplemented" % op)
 
     def _raise_cb_op_unimplemented(self, fn_name):
-        print("cb code", fn_name, "unimplemented!")
-        self._raise_opcode_unimplemented()
+        raise NotImplementedError("cb code %s unimplemented" % fn_name)
 
     # Opcodes
     # ----------------------------
     def _nop(self):
         """NOP opcode."""
-        self.registers['m'] = 1
+        pass
 
     # Loads
     def _ld_rr(self, r1, r2):
         """Load value r2 into r1."""
-        self.registers[r1] = self.registers[r2]
-        self.registers['m'] = 1
+        setattr(self, r1, getattr(self, r2))
 
     def _ld_rn(self, r):
         """Load mem @ pc into register r."""
-        self.registers[r] = self.read8(self.registers['pc'])
-        self.registers['pc'] += 1
-        self.registers['m'] = 2
+        setattr(self, r, self.mem[self.pc])
+        self.pc += 1
 
     def _ld_r_hlm(self, r):
-        """Load mem @ HL into registers[r]."""
-        read_val = self.read8((self.registers['h'] << 8) + self.registers['l'])
-        self.registers[r] = read_val
-        self.registers['m'] = 2
+        """Load mem @ HL into register r."""
+        setattr(self, r, self.mem[(self.h << 8) | self.l])
 
     def _ld_hlm_r(self, r):
-        """Load registers[r] into mem @ HL."""
-        address = (self.registers['h'] << 8) + self.registers['l']
-        self.write8(address, self.registers[r])
-        self.registers['m'] = 2
+        """Load register r into mem @ HL."""
+        address = (self.h << 8) | self.l
+        self.write8(address, getattr(self, r))
 
     def _ld_hlm_n(self):
         """Load mem @ pc into mem @ HL."""
-        address = (self.registers['h'] << 8) + self.registers['l']
-        self.write8(address, self.registers['pc'])
-        self.registers['pc'] += 1
-        self.registers['m'] = 3
+        self.write8((self.h << 8) | self.l, self.mem[self.pc])
+        self.pc += 1
 
     def _ld_r1r2m_a(self, r1, r2):
-        """Load registers[a] into mem @ BC."""
-        address = (self.registers[r1] << 8) + self.registers[r2]
-        self.write8(address, self.registers['a'])
-        self.registers['m'] = 2
+        """Load register A into mem @ r1r2."""
+        address = (getattr(self, r1) << 8) | getattr(self, r2)
+        self.write8(address, self.a)
 
     def _ld_nn_a(self):
-        """Load byte registers['a'] into mem @ 16-bit address.
+        """Load register A into mem @ 16-bit address.
 
-        address = mem (16-bit) @ registers[pc]
+        address = mem (16-bit) @ PC
         """
-        address = self.read16(self.registers['pc'])
-        self.write8(address, self.registers['a'])
-        self.registers['pc'] += 2
-        self.registers['m'] = 4
+        mem, pc = self.mem, self.pc
+        self.write8(mem[pc] + (mem[pc + 1] << 8), self.a)
+        self.pc = pc + 2
 
     def _ld_a_r1r2m(self, r1, r2):
-        """Load mem @ r1r2 into registers[a]."""
-        address = (self.registers[r1] << 8) + self.registers[r2]
-        self.registers['a'] = self.read8(address)
-        self.registers['m'] = 2
+        """Load mem @ r1r2 into register A."""
+        self.a = self.mem[(getattr(self, r1) << 8) | getattr(self, r2)]
 
     def _ld_a_nn(self):
-        """Load byte @ address into registers[a].
+        """Load byte @ address into register A.
 
-        address = mem (16-bit) @ registers[pc]
+        address = mem (16-bit) @ PC
         """
-        address = self.read16(self.registers['pc'])
-        self.registers['a'] = self.read8(address)
-        self.registers['pc'] += 2
-        self.registers['m'] = 4
+        mem, pc = self.mem, self.pc
+        self.a = mem[mem[pc] + (mem[pc + 1] << 8)]
+        self.pc = pc + 2
 
     def _ld_r1r2_nn(self, r1, r2):
         """Load 16-bit immediate value into two 8-bit registers."""
-        self.registers[r2] = self.read8(self.registers['pc'])
-        self.registers[r1] = self.read8(self.registers['pc'] + 1)
-        self.registers['pc'] += 2
-        self.registers['m'] = 3
+        mem, pc = self.mem, self.pc
+        setattr(self, r2, mem[pc])
+        setattr(self, r1, mem[pc + 1])
+        self.pc = pc + 2
 
     def _ld_sp_nn(self):
         """Load 16-bit immediate value into stack pointer."""
-        self.registers['sp'] = self.read16(self.registers['pc'])
-        self.registers['pc'] += 2
-        self.registers['m'] = 3
+        mem, pc = self.mem, self.pc
+        self.sp = mem[pc] + (mem[pc + 1] << 8)
+        self.pc = pc + 2
 
     def _ld_nn_sp(self):
         """Load SP into mem @ address (mm)."""
-        address = self.read16(self.registers['pc'])
-        self.write16(address, self.registers['sp'])
-        self.registers['pc'] += 2
-        self.registers['m'] = 4
+        mem, pc = self.mem, self.pc
+        self.write16(mem[pc] + (mem[pc + 1] << 8), self.sp)
+        self.pc = pc + 2
 
     def _ld_hlmi_a(self):
         """Put A into memory address HL. Increment HL.
 
         Same as: LD (HL),A - INC HL
         """
-        address = (self.registers['h'] << 8) + self.registers['l']
-        self.write8(address, self.registers['a'])
-        self._inc_r_r('h', 'l', m=2)
+        hl = (self.h << 8) | self.l
+        self.write8(hl, self.a)
+        hl = (hl + 1) & 65535
+        self.h, self.l = hl >> 8, hl & 255
 
     def _ld_hlmd_a(self):
         """Put A into memory address HL. Decrement HL.
 
         Same as: LD (HL),A - DEC HL
         """
-        address = (self.registers['h'] << 8) + self.registers['l']
-        self.write8(address, self.registers['a'])
-        self._dec_r_r('h', 'l', m=2)
+        hl = (self.h << 8) | self.l
+        self.write8(hl, self.a)
+        hl = (hl - 1) & 65535
+        self.h, self.l = hl >> 8, hl & 255
 
     def _ld_a_hl_i(self):
         """Load mem @ hl into reg a and increment."""
-        address = (self.registers['h'] << 8) + self.registers['l']
-        self.registers['a'] = self.read8(address)
-        self._inc_r_r('h', 'l', m=2)
+        hl = (self.h << 8) | self.l
+        self.a = self.mem[hl]
+        hl = (hl + 1) & 65535
+        self.h, self.l = hl >> 8, hl & 255
 
     def _ld_a_hl_d(self):
         """Load mem @ hl into reg a and decrement."""
-        address = (self.registers['h'] << 8) + self.registers['l']
-        self.registers['a'] = self.read8(address)
-        self._dec_r_r('h', 'l', m=2)
+        hl = (self.h << 8) | self.l
+        self.a = self.mem[hl]
+        hl = (hl - 1) & 65535
+        self.h, self.l = hl >> 8, hl & 255
 
     def _ldh_a_n(self):
         """Put mem @ address $FF00+n into register a."""
-        n = self.read8(self.registers['pc'])
-        addr = 0xFF00 + n
-        val = self.read8(addr)
-        self.registers['a'] = val
-        self.registers['pc'] += 1
-        self.registers['m'] = 3
+        mem = self.mem
+        self.a = mem[0xFF00 + mem[self.pc]]
+        self.pc += 1
 
     def _ldh_n_a(self):
         """Put register A into mem @ address $FF00+n."""
-        n = self.read8(self.registers['pc'])
-        self.write8(0xFF00 + n, self.registers['a'])
-        self.registers['pc'] += 1
-        self.registers['m'] = 3
+        mem = self.mem      # I/O and zero page: no write hooks
+        mem[0xFF00 + mem[self.pc]] = self.a
+        self.pc += 1
 
     def _ld_a_c(self):
         """Put value @ address $FF00+C into register A."""
-        self.registers['a'] = self.read8(0xFF00 + self.registers['c'])
-        self.registers['m'] = 2
+        self.a = self.mem[0xFF00 + self.c]
 
     def _ld_c_a(self):
         """Put A into mem @ address $FF00 + C."""
-        self.write8(self.read8(0xFF00 + self.registers['c']), self.registers['a'])
-        self.registers['m'] = 2
+        self.mem[0xFF00 + self.c] = self.a    # I/O: no write hooks
 
     def _ld_hl_sp_n(self):
         """Put SP+n effective address into HL.
 
         n = 1 byte signed immediate value
         """
-        n = self.read8(self.registers['pc'])
-        if n > 127:
-            n = ((~n + 1) & 255)
-        result = n + self.registers['sp']
-
-        # set flags
-        self.registers['f'] = 0
-        xor_result = (self.registers['sp'] ^ n ^ result)
-        if (xor_result & 0x100) == 0x100:
-            self._toggle_flag(FLAG['carry'])
-        if (xor_result & 0x10) == FLAG['carry']:
-            self._toggle_flag(FLAG['half-carry'])
-
-        self.registers['h'] = (result >> 8) & 255
-        self.registers['l'] = result & 255
-        self.registers['pc'] += 1
-        self.registers['m'] = 3
+        n = self.mem[self.pc]
+        sp = self.sp
+        result = (sp + SIGNED8[n]) & 65535
+        # H and C come from the unsigned add of the low bytes; Z, N = 0.
+        self.f = ADD_FLAGS[((sp & 255) << 8) | n] & 0x30
+        self.h = result >> 8
+        self.l = result & 255
+        self.pc += 1
 
     def _ld_sp_hl(self):
         """Put HL into SP."""
-        h_shift = (self.registers['h'] << 8)
-        self.registers['sp'] = h_shift + self.registers['l']
-        self.registers['m'] = 2
+        self.sp = (self.h << 8) | self.l
 
     # Jumps
     def _jp_nn(self):
         """Jump to two byte immediate value."""
-        self.registers['pc'] = self.read16(self.registers['pc'])
-        self.registers['m'] = 3
+        mem, pc = self.mem, self.pc
+        self.pc = mem[pc] + (mem[pc + 1] << 8)
 
     def _jp_cc_nn(self, and_val, flag_check_value):
         """Jump to address n if condition is true.
@@ -957,47 +630,42 @@ class GbZ80Cpu(object):
         cc = C, Jump if C flag is set.
         nn = two byte immediate value. (LS byte first.)
         """
-        self.registers['m'] = 3
-        if (self.registers['f'] & and_val) == flag_check_value:
-            self.registers['pc'] = self.read16(self.registers['pc'])
-            self.registers['m'] += 1
+        if (self.f & and_val) == flag_check_value:
+            mem, pc = self.mem, self.pc
+            self.pc = mem[pc] + (mem[pc + 1] << 8)
+            self.clock_m += 1
         else:
-            self.registers['pc'] += 2
+            self.pc += 2
 
     def _jr_n(self):
         """Add signed immediate value to current address and jump to it."""
-        i = self.read8(self.registers['pc'])
-        if i > 127:
-            i = -(~i + 1) & 255
-        self.registers['pc'] += 1
-        self.registers['m'] = 2
-        self.registers['pc'] += i
-        self.registers['m'] += 1
+        self.pc = (self.pc + 1 + SIGNED8[self.mem[self.pc]]) & 65535
 
     def _jr_cc_n(self, and_val, flag_check_value):
         """If Z flag reset, add n to current address and jump to it.
 
         n = one byte signed immediate value
         """
-        i = self.read8(self.registers['pc'])
-        if i > 127:
-            i = -(~i + 1) & 255
-        self.registers['pc'] += 1
-        self.registers['m'] = 2
-        if (self.registers['f'] & and_val) == flag_check_value:
-            self.registers['pc'] += i
-            self.registers['m'] += 1
+        pc = self.pc
+        if (self.f & and_val) == flag_check_value:
+            self.pc = (pc + 1 + SIGNED8[self.mem[pc]]) & 65535
+            self.clock_m += 1
+        else:
+            self.pc = pc + 1
 
     # Interrupts
+    def _halt(self):
+        """Halt the cpu until an interrupt occurs."""
+        self.halted = 1
+        raise _CpuHalted()
+
     def _di(self):
         """Disable interrupts."""
-        self.registers['ime'] = 0
-        self.registers['m'] = 1
+        self.ime = 0
 
     def _ei(self):
         """Enable interrupts."""
-        self.registers['ime'] = 1
-        self.registers['m'] = 1
+        self.ime = 1
 
     # PUSH / POP
     def _push_nn(self, r1, r2):
@@ -1005,22 +673,38 @@ class GbZ80Cpu(object):
 
         Decrement Stack Pointer (SP) twice.
         """
-        self.registers['sp'] -= 1
-        self.write8(self.registers['sp'], self.registers[r1])
-        self.registers['sp'] -= 1
-        self.write8(self.registers['sp'], self.registers[r2])
-        self.registers['m'] = 3
+        self._push16((getattr(self, r1) << 8) | getattr(self, r2))
 
     def _pop_nn(self, r1, r2):
         """Pop register pair nn onto stack.
 
         Increment Stack Pointer (SP) twice.
         """
-        self.registers[r2] = self.read8(self.registers['sp'])
-        self.registers['sp'] += 1
-        self.registers[r1] = self.read8(self.registers['sp'])
-        self.registers['sp'] += 1
-        self.registers['m'] = 3
+        mem, sp = self.mem, self.sp
+        setattr(self, r2, mem[sp])
+        sp = (sp + 1) & 65535
+        setattr(self, r1, mem[sp])
+        self.sp = (sp + 1) & 65535
+
+    def _push16(self, value):
+        """Push a 16-bit value onto the stack, high byte first.
+
+        The stack normally sits in RAM above VRAM, where the bytes can be
+        stored straight into mem; anywhere else they go through write8
+        so VRAM updates the GPU and ROM drops stale fused blocks.
+        """
+        sp = self.sp
+        if sp > 0xA002:
+            mem = self.mem
+            mem[sp - 1] = value >> 8
+            mem[sp - 2] = value & 255
+            self.sp = sp - 2
+        else:
+            sp = (sp - 1) & 65535
+            self.write8(sp, value >> 8)
+            sp = (sp - 1) & 65535
+            self.write8(sp, value & 255)
+            self.sp = sp
 
     # CALLs
     def _call_nn(self):
@@ -1028,10 +712,9 @@ class GbZ80Cpu(object):
 
         Opcode #205
         """
-        self.registers['sp'] -= 2
-        self.write16(self.registers['sp'], self.registers['pc'] + 2)
-        self.registers['pc'] = self.read16(self.registers['pc'])
-        self.registers['m'] = 5
+        mem, pc = self.mem, self.pc
+        self._push16((pc + 2) & 65535)
+        self.pc = mem[pc] + (mem[pc + 1] << 8)
 
     # SUB / ADD
     def _sub_n(self, r):
@@ -1039,206 +722,186 @@ class GbZ80Cpu(object):
 
         n = A,B,C,D,E,H,L
         """
-        a = self.registers['a']
-        self.registers['a'] -= self.registers[r]
-        self.registers['f'] = 0x50 if self.registers['a'] < 0 else FLAG['sub']
-        self.registers['a'] &= 255
-
-        if not self.registers['a']:
-            self.registers['f'] |= FLAG['zero']
-        if (self.registers['a'] ^ self.registers[r] ^ a) & FLAG['carry']:
-            self.registers['f'] |= FLAG['half-carry']
-        self.registers['m'] = 1
+        i = (self.a << 8) | getattr(self, r)
+        self.a = SUB_RESULT[i]
+        self.f = SUB_FLAGS[i]
 
     def _sub_a_n(self, n):
         """Subtract n + Carry flag from A."""
-        a = self.registers['a']
-        self.registers['a'] -= self.registers[n]
-        self.registers['a'] -= 1 \
-            if (self.registers['f'] & FLAG['carry']) else 0
-
-        self.registers['f'] = 0x50 if self.registers['a'] < 0 else FLAG['sub']
-        self.registers['a'] &= 255
-    
-        if not self.registers['a']:
-            self.registers['f'] |= FLAG['zero']
-        if (self.registers['a'] ^ self.registers[n] ^ a) & FLAG['carry']:
-            self.registers['f'] |= FLAG['half-carry']
-        self.registers['m'] = 1
+        i = ((self.f & FLAG_C) << 12) | (self.a << 8) | getattr(self, n)
+        self.a = SUB_RESULT[i]
+        self.f = SUB_FLAGS[i]
 
     def _cp_n(self, n):
         """Compare A with n."""
         if n == 'pc':
-            m = self.read8(self.registers[n])
+            m = self.mem[self.pc]
+            self.pc += 1
         else:
-            m = self.registers[n]
-
-        i = self.registers['a']
-        i -= m
-        self.registers['pc'] += 1
-        self.registers['f'] = 0x50 if i < 0 else FLAG['sub']
-        if not i:
-            self.registers['f'] |= FLAG['zero']
-        if (self.registers['a'] ^ i ^ m) & FLAG['carry']:
-            self.registers['f'] |= FLAG['half-carry']
-        self.registers['m'] = 2
-
-    def _add_a_n(self, n):  # bug!
+            m = getattr(self, n)
+
+        self.f = SUB_FLAGS[(self.a << 8) | m]
+
+    def _add_a_n(self, n):
         """Add n to A."""
-        a = self.registers['a']
-        self.registers['a'] += self.registers[n]
-        # set flags...
-        self.registers['f'] = FLAG['carry'] if self.registers['a'] > 255 else 0
-        self.registers['a'] &= 255
-        if not self.registers['a']:
-            self.registers['f'] |= FLAG['zero']
-        if (self.registers['a'] ^ self.registers['b'] ^ a) & FLAG['carry']:
-            self.registers['f'] |= FLAG['half-carry']
-        self.registers['m'] = 1
+        i = (self.a << 8) | getattr(self, n)
+        self.a = ADD_RESULT[i]
+        self.f = ADD_FLAGS[i]
+
+    def _adc_a_n(self, n):
+        """Add n + Carry flag to A."""
+        i = ((self.f & FLAG_C) << 12) | (self.a << 8) | getattr(self, n)
+        self.a = ADD_RESULT[i]
+        self.f = ADD_FLAGS[i]
 
     def _add_sp_n(self):
         """Add n to Stack Pointer (SP).
 
         n = one byte signed immediate value
         """
-        n = self.read8(self.registers['pc'])
-        if n > 127:
-            n = -((~n + 1) & 255)
-        self.registers['pc'] += 1
-        self.registers['sp'] += n
-        self.registers['m'] = 4
+        n = self.mem[self.pc]
+        sp = self.sp
+        # H and C come from the unsigned add of the low bytes; Z, N = 0.
+        self.f = ADD_FLAGS[((sp & 255) << 8) | n] & 0x30
+        self.sp = (sp + SIGNED8[n]) & 65535
+        self.pc += 1
 
     def _add_hl_n(self, r1, r2):
         """Add n to HL.
 
         n = BC,DE,HL
         """
-        hl = (self.registers['h'] << 8) + self.registers['l']
-        hl += (self.registers[r1] << 8) + self.registers[r2]
-        if hl > 65535:
-            self.registers['f'] |= FLAG['carry']
-        else:
-            self.registers['f'] &= 0xEF
-
-        self.registers['h'] = (hl >> 8) & 255
-        self.registers['l'] = hl & 255
-        self.registers['m'] = 3
+        hl = (self.h << 8) | self.l
+        n = (getattr(self, r1) << 8) | getattr(self, r2)
+        self.f = ((self.f & FLAG_Z) |
+                  (FLAG_H if (hl & 0xFFF) + (n & 0xFFF) > 0xFFF else 0) |
+                  (FLAG_C if hl + n > 0xFFFF else 0))
+        hl += n
+        self.h = (hl >> 8) & 255
+        self.l = hl & 255
 
     def _add_hl_sp(self):
         """Add n to HL.
 
         n = SP
         """
-        hl = (self.registers['h'] << 8) + self.registers['l']
-        hl += self.registers['sp']
-
-        if hl > 65535:
-            self.registers['f'] |= FLAG['carry']
-        else:
-            self.registers['f'] &= 0xEF
-
-        self.registers['h'] = (hl >> 8) & 255
-        self.registers['l'] = hl & 255
-        self.registers['m'] = 3
+        hl = (self.h << 8) | self.l
+        n = self.sp
+        self.f = ((self.f & FLAG_Z) |
+                  (FLAG_H if (hl & 0xFFF) + (n & 0xFFF) > 0xFFF else 0) |
+                  (FLAG_C if hl + n > 0xFFFF else 0))
+        hl += n
+        self.h = (hl >> 8) & 255
+        self.l = hl & 255
 
     # INC / DEC
-    def _inc_r_r(self, r1, r2, m=1):
+    def _inc_r_r(self, r1, r2):
         """Increment registers.
 
         INC HL, INC DE, INC BC
         """
-        self.registers[r2] = (self.registers[r2] + 1) & 255
-        if not self.registers[r2]:
-            self.registers[r1] = (self.registers[r1] + 1) & 255
-        self.registers['m'] = m
+        val = (((getattr(self, r1) << 8) | getattr(self, r2)) + 1) & 65535
+        setattr(self, r1, val >> 8)
+        setattr(self, r2, val & 255)
 
-    def _dec_r_r(self, r1, r2, m=1):
+    def _dec_r_r(self, r1, r2):
         """Decrement registers.
 
         DEC HL, DEC DE, DEC BC
         """
-        self.registers[r2] = (self.registers[r2] - 1) & 255
-        if self.registers[r2]:
-            self.registers[r1] = (self.registers[r1] - 1) & 255
-        self.registers['m'] = m
+        val = (((getattr(self, r1) << 8) | getattr(self, r2)) - 1) & 65535
+        setattr(self, r1, val >> 8)
+        setattr(self, r2, val & 255)
 
     def _dec_r(self, r):
         """Decrement register."""
-        self.registers[r] -= 1
-        self.registers[r] &= 255
-        self.registers['f'] = 0 if self.registers[r] else FLAG['zero']
-        self.registers['m'] = 1
+        val = (getattr(self, r) - 1) & 255
+        setattr(self, r, val)
+        self.f = (self.f & FLAG_C) | DEC_FLAGS[val]
 
     def _inc_r(self, r):
         """Increment register."""
-        self.registers[r] += 1
-        self.registers[r] &= 255
-        self.registers['f'] = 0 if self.registers[r] else FLAG['zero']
-        self.registers['m'] = 1
+        val = (getattr(self, r) + 1) & 255
+        setattr(self, r, val)
+        self.f = (self.f & FLAG_C) | INC_FLAGS[val]
 
     def _inc_sp(self):
         """Increment stack pointer."""
-        self.registers['sp'] = (self.registers['sp'] + 1) & 65535
-        self.registers['m'] = 1
+        self.sp = (self.sp + 1) & 65535
 
     def _dec_sp(self):
         """Decrement stack pointer."""
-        self.registers['sp'] = (self.registers['sp'] - 1) & 65535
-        self.registers['m'] = 1
+        self.sp = (self.sp - 1) & 65535
+
+    def _bit_b_r(self, b, r):
+        """Set Z if bit b of register r (or mem @ HL) is zero."""
+        if r == 'hl':
+            v = self.mem[(self.h << 8) | self.l]
+        else:
+            v = getattr(self, r)
+        self.f = (self.f & FLAG_C) | FLAG_H | (0 if v & (1 << b) else FLAG_Z)
+
+    def _res_b_r(self, b, r):
+        """Reset bit b of register r (or mem @ HL)."""
+        if r == 'hl':
+            address = (self.h << 8) | self.l
+            self.write8(address, self.mem[address] & ~(1 << b))
+        else:
+            setattr(self, r, getattr(self, r) & ~(1 << b))
+
+    def _set_b_r(self, b, r):
+        """Set bit b of register r (or mem @ HL)."""
+        if r == 'hl':
+            address = (self.h << 8) | self.l
+            self.write8(address, self.mem[address] | (1 << b))
+        else:
+            setattr(self, r, getattr(self, r) | (1 << b))
 
     def _swap_n(self, n):
         """Swap upper & lower nibles of n."""
-        tr = self.registers[n]
-        self.registers[n] = ((tr & 0xF) << 4) | ((tr & 0xF0) >> 4)
-        self.registers['f'] = 0 if self.registers[n] else FLAG['zero']
-        self.registers['m'] = 1
+        v = getattr(self, n)
+        setattr(self, n, SWAP_RESULT[v])
+        self.f = 0 if v else FLAG_Z
 
     # Boolean logic
     def _and_n(self, n):
         """Logically AND n with A, result in A."""
         if n == 'pc':
-            self.registers['a'] &= self.read8(self.registers['pc'])
-            self.registers['pc'] += 1
-            self.registers['m'] = 2
+            a = self.a & self.mem[self.pc]
+            self.pc += 1
         elif n == 'hl':
-            self.registers['a'] &= self.read8((self.registers['h'] << 8) +
-                                              self.registers['l'])
-            self.registers['m'] = 2
+            a = self.a & self.mem[(self.h << 8) | self.l]
         else:
-            self.registers['a'] &= self.registers[n]
-            self.registers['m'] = 1
+            a = self.a & getattr(self, n)
 
-        self.registers['a'] &= 255
-        self.registers['f'] = 0 if self.registers['a'] else FLAG['zero']
+        self.a = a
+        self.f = FLAG_H if a else FLAG_Z | FLAG_H
 
     def _or_n(self, n):
         """Logical OR n with register A, result in A."""
-        self.registers['a'] |= self.registers[n]
-        self.registers['a'] &= 255
-        self.registers['f'] = 0 if self.registers['a'] else FLAG['zero']
-        self.registers['m'] = 1
+        a = self.a | getattr(self, n)
+        self.a = a
+        self.f = 0 if a else FLAG_Z
 
     def _xor_a_n(self, n):
         """Logical XOR n with register A, result in A."""
-        self.registers['a'] ^= self.registers[n]
-        self.registers['a'] &= 255
-        self.registers['f'] = 0 if self.registers['a'] else FLAG['zero']
-        self.registers['m'] = 1
+        a = self.a ^ getattr(self, n)
+        self.a = a
+        self.f = 0 if a else FLAG_Z
 
     def _xor_n(self):
         """Logical XOR immediate byte with register A, result in A."""
-        self.registers['a'] ^= self.read8(self.registers['pc'])
-        self.registers['pc'] += 1
-        self.registers['a'] &= 255
-        self.registers['f'] = 0 if self.registers['a'] else FLAG['zero']
-        self.registers['m'] = 2
+        a = self.a ^ self.mem[self.pc]
+        self.a = a
+        self.pc += 1
+        self.f = 0 if a else FLAG_Z
 
     # Returns
     def _ret(self):
         """Pop two bytes from stack & jump to that address."""
-        self.registers['pc'] = self.read16(self.registers['sp'])
-        self.registers['sp'] += 2
-        self.registers['m'] = 3
+        mem, sp = self.mem, self.sp
+        self.pc = mem[sp] + (mem[(sp + 1) & 65535] << 8)
+        self.sp = (sp + 2) & 65535
 
     def _rst_n(self, n):
         """Push present address onto stack and jump to address $0000 + n.
@@ -1246,78 +909,448 @@ class GbZ80Cpu(object):
         n = n = $00,$08,$10,$18,$20,$28,$30,$38
         """
         self._rsv()
-        self.registers['sp'] -= 2
-        self.write16(self.registers['sp'], self.registers['pc'])
-        self.registers['pc'] = n
-        self.registers['m'] = 3
+        self._push16(self.pc)
+        self.pc = n
 
     def _reti(self):
         """Pop two bytes from stack & jump to that address.
 
         Also enable interrupts
         """
-        self.registers['ime'] = 1
+        self.ime = 1
         self._rrs()
-        self.registers['pc'] = self.read16(self.registers['sp'])
-        self.registers['sp'] += 2
-        self.registers['m'] = 3
+        mem, sp = self.mem, self.sp
+        self.pc = mem[sp] + (mem[(sp + 1) & 65535] << 8)
+        self.sp = (sp + 2) & 65535
 
     def _ret_f(self, and_val, flag_check_value):
         """Return if condition is true."""
-        self.registers['m'] = 1
-        if (self.registers['f'] & and_val) == flag_check_value:
-            self.registers['pc'] = self.read16(self.registers['sp'])
-            self.registers['sp'] += 2
-            self.registers['m'] += 2
+        if (self.f & and_val) == flag_check_value:
+            mem, sp = self.mem, self.sp
+            self.pc = mem[sp] + (mem[(sp + 1) & 65535] << 8)
+            self.sp = (sp + 2) & 65535
+            self.clock_m += 2
 
     def _rsv(self):
         """Copy some values from registers into rsv."""
-        for reg in ['a', 'b', 'c', 'd', 'e', 'f', 'h', 'l']:
-            self.rsv[reg] = self.registers[reg]
+        self.rsv = (self.a, self.b, self.c, self.d, self.e, self.f,
+                    self.h, self.l)
 
     def _rrs(self):
         """Copy values from rsv into registers."""
-        for reg in ['a', 'b', 'c', 'd', 'e', 'f', 'h', 'l']:
-            self.registers[reg] = self.rsv[reg]
+        (self.a, self.b, self.c, self.d, self.e, self.f,
+         self.h, self.l) = self.rsv
 
     # Misc
     def cpl(self):
         """Compliment A register (bit flip)."""
-        self.registers['a'] = (~self.registers['a']) & 0xFF
-        self.registers['f'] &= FLAG['zero']
-        self.registers['f'] |= 0x60
-        self.registers['m'] = 1
+        self.a = (~self.a) & 0xFF
+        self.f = (self.f & (FLAG_Z | FLAG_C)) | FLAG_N | FLAG_H
 
     def _rlc_n(self, n):
         """Rotate n left. Old bit 7 to Carry flag."""
-        ci, co = (1, FLAG['carry']) if (self.registers[n] & FLAG['zero']) \
-            else (0, 0)
-        self.registers[n] = (self.registers[n] << 1) + ci
-        self.registers[n] &= 255
-        f = 0 if self.registers[n] else FLAG['zero']
-        self.registers['f'] = (f & 0xEF) + co
-        self.registers['m'] = 2
+        v = getattr(self, n)
+        setattr(self, n, RLC_RESULT[v])
+        self.f = RLC_FLAGS[v]
 
     def _rlc_a(self):
         """Rotate A left. Old bit 7 to Carry flag."""
-        ci, co = (1, FLAG['carry']) if (self.registers['a'] & FLAG['zero']) \
-            else (0, 0)
-        self.registers['a'] = (self.registers['a'] << 1) + ci
-        self.registers['a'] &= 255
-        self.registers['f'] = (self.registers['f'] & 0xEF) + co
-        self.registers['m'] = 1
+        a = self.a
+        self.a = RLC_RESULT[a]
+        self.f = RLC_FLAGS[a] & FLAG_C
 
     def _scf(self):
         """Set carry flag."""
-        self.registers['f'] |= FLAG['carry']
-        self.registers['m'] = 1
-
-
+        self.f = (self.f & FLAG_Z) | FLAG_C
+
+
+def _compile_block(mem, start):
+    """Return a function running the fused block at start, or False.
+
+    A block is a run of two or more opcodes whose handler is in
+    FUSABLE_HANDLERS.
+    """
+    ops = []
+    pc = start
+    while (pc < ROM_END and len(ops) < MAX_BLOCK_LEN and
+           _is_fusable(mem[pc])):
+        ops.append(mem[pc])
+        pc += 1
+    if len(ops) < 2:
+        return False
+    try:
+        return _block_function(tuple(ops))
+    except (OSError, TypeError):
+        return False    # no handler source to inline
+
+
+@functools.lru_cache(maxsize=None)
+def _block_function(ops):
+    """Return a function running the opcodes in ops as one block.
+
+    The handler bodies are pasted in one after another (see
+    _inline_body), then pc moves past them and their cycles are added
+    once.  Nothing in it depends on where the block is, so identical
+    runs of opcodes share one function.
+    """
+    block = ast.parse('def _block(self):\n'
+                      '    self.pc += %d\n'
+                      '    self.clock_m += %d\n' %
+                      (len(ops), sum(OPCODE_CYCLES[op] for op in ops)))
+    func = block.body[0]
+    body = []
+    for i, op in enumerate(ops):
+        body += _inline_body(op, '_%d' % i)
+    func.body[:0] = body
+    namespace = {}
+    exec(compile(block, __file__, 'exec'), globals(), namespace)
+    return namespace['_block']
+
+
+def _inline_body(op, suffix):
+    """Return the statements of opcode op's handler, ready to inline.
+
+    The docstring is dropped and the handler's locals get suffix, so
+    bodies pasted into the same function cannot clash or shadow a
+    global another body reads.  The cpu argument must be named self,
+    and the body must run to its end: a return or raise would skip the
+    rest of the block, so such handlers are rejected.
+    """
+    name, args = _OPCODE_SPEC[op]
+    func = _specialized_tree(getattr(GbZ80Cpu, name), args).body[0]
+    body = func.body
+    if any(isinstance(node, (ast.Return, ast.Raise))
+           for node in ast.walk(func)):
+        raise ValueError("%s exits early and cannot be in "
+                         "FUSABLE_HANDLERS" % name)
+    if (isinstance(body[0], ast.Expr) and
+            isinstance(body[0].value, ast.Constant)):
+        body = body[1:]
+    stored = {node.id for stmt in body for node in ast.walk(stmt)
+              if isinstance(node, ast.Name) and
+              isinstance(node.ctx, ast.Store)}
+    for stmt in body:
+        for node in ast.walk(stmt):
+            if isinstance(node, ast.Name) and node.id in stored:
+                node.id += suffix
+    return body
+
+
+def _is_fusable(op):
+    """Return whether opcode op may be part of a fused block."""
+    name, args = _OPCODE_SPEC[op]
+    return name in FUSABLE_HANDLERS and 'pc' not in args
+
+
+class _ArgInliner(ast.NodeTransformer):
+    """Rewrite a handler body with its register/flag arguments inlined.
+
+    getattr(self, r) and setattr(self, r, v) become plain attribute
+    access, other uses of an argument become a constant, and an if
+    statement comparing two constants keeps only the branch taken.
+    """
+
+    def __init__(self, binding):
+        self.binding = binding
+
+    def _bound_name(self, node):
+        """Return the register name node stands for, or None."""
+        if isinstance(node, ast.Name) and node.id in self.binding:
+            value = self.binding[node.id]
+            if isinstance(value, str):
+                return value
+        return None
+
+    def visit_Name(self, node):
+        if node.id in self.binding and isinstance(node.ctx, ast.Load):
+            return ast.copy_location(
+                ast.Constant(self.binding[node.id]), node)
+        return node
+
+    def visit_Call(self, node):
+        func = node.func
+        if (isinstance(func, ast.Name) and func.id == 'getattr' and
+                len(node.args) == 2):
+            reg = self._bound_name(node.args[1])
+            if reg is not None:
+                return ast.copy_location(
+                    ast.Attribute(node.args[0], reg, ast.Load()), node)
+        return self.generic_visit(node)
+
+    def visit_Expr(self, node):
+        call = node.value
+        if (isinstance(call, ast.Call) and isinstance(call.func, ast.Name)
+                and call.func.id == 'setattr' and len(call.args) == 3):
+            reg = self._bound_name(call.args[1])
+            if reg is not None:
+                target = ast.copy_location(
+                    ast.Attribute(call.args[0], reg, ast.Store()), call)
+                return ast.copy_location(
+                    ast.Assign([target], self.visit(call.args[2])), node)
+        return self.generic_visit(node)
+
+    def visit_If(self, node):
+        self.generic_visit(node)
+        test = node.test
+        if (isinstance(test, ast.Compare) and len(test.ops) == 1 and
+                isinstance(test.ops[0], (ast.Eq, ast.NotEq)) and
+                isinstance(test.left, ast.Constant) and
+                isinstance(test.comparators[0], ast.Constant)):
+            taken = test.left.value == test.comparators[0].value
+            if isinstance(test.ops[0], ast.NotEq):
+                taken = not taken
+            return ((node.body if taken else node.orelse) or
+                    ast.copy_location(ast.Pass(), node))
+        return node
+
+
+@functools.lru_cache(maxsize=None)
+def _handler_source(handler):
+    """Return the dedented source of a handler method.
+
+    It is padded with blank lines so that parsing it gives the same line
+    numbers as the original file.
+    """
+    return ('\n' * (handler.__code__.co_firstlineno - 1) +
+            textwrap.dedent(inspect.getsource(handler)))
+
+
+def _specialize(handler, args):
+    """Return handler taking only the cpu, with args compiled into it.
+
+    Rather than binding args in a closure, the handler's source is
+    recompiled with them inlined (see _ArgInliner), so the generated
+    function has no getattr/setattr by register name and no extra call.
+    """
+    if not args:
+        return handler
+    if handler.__name__ in ('_raise_opcode_unimplemented',
+                            '_raise_cb_op_unimplemented'):
+        # Cold path: a closure is plenty and avoids compiling the stubs.
+        return lambda cpu: handler(cpu, *args)
+    try:
+        tree = _specialized_tree(handler, args)
+    except (OSError, TypeError):
+        # No source to recompile (e.g. only .pyc installed).
+        return lambda cpu: handler(cpu, *args)
+    namespace = {}
+    code = compile(tree, handler.__code__.co_filename, 'exec')
+    exec(code, handler.__globals__, namespace)
+    return namespace[tree.body[0].name]
+
+
+def _specialized_tree(handler, args):
+    """Return a module AST defining handler with args inlined."""
+    tree = ast.parse(_handler_source(handler))
+    func = tree.body[0]
+    params = [arg.arg for arg in func.args.args[1:len(args) + 1]]
+    func = _ArgInliner(dict(zip(params, args))).visit(func)
+    del func.args.args[1:len(args) + 1]
+    func.name = '_'.join([handler.__name__] + [str(arg) for arg in args])
+    return tree
+
+
+_OPCODE_SPEC = {
+    # opcode number: handler name, args
+    0: ('_nop', ()),  # NOP
+    1: ('_ld_r1r2_nn', ('b', 'c')),  # LDBCnn
+    2: ('_ld_r1r2m_a', ('b', 'c')),  # LDBCmA
+    3: ('_inc_r_r', ('b', 'c')),  # INCBC
+    4: ('_inc_r', ('b',)),  # INCr_b
+    5: ('_dec_r', ('b',)),  # DECr_b
+    6: ('_ld_rn', ('b',)),  # LDrn_b
+    7: ('_rlc_a', ()),  # RLCA
+    8: ('_ld_nn_sp', ()),  # LDnnSP -- double check this one...
+    9: ('_add_hl_n', ('b', 'c')),  # ADDHLBC
+    10: ('_ld_a_r1r2m', ('b', 'c')),  # LDABCm
+    11: ('_dec_r_r', ('b', 'c')),  # DECBC
+    12: ('_inc_r', ('c',)),  # INCr_c
+    13: ('_dec_r', ('c',)),  # DECr_c
+    14: ('_ld_rn', ('c',)),  # LDrn_c
+    15: ('_raise_opcode_unimplemented', ()),  # RRCA
+    16: ('_raise_opcode_unimplemented', ()),  # DJNZn
+    17: ('_ld_r1r2_nn', ('d', 'e')),  # LDDEnn
+    18: ('_ld_r1r2m_a', ('d', 'e')),  # LDDEmA
+    19: ('_inc_r_r', ('d', 'e')),  # INCDE
+    20: ('_inc_r', ('d',)),  # INCr_d
+    21: ('_dec_r', ('d',)),  # DECr_d
+    22: ('_ld_rn', ('d',)),  # LDrn_d
+    23: ('_raise_opcode_unimplemented', ()),  # RLA
+    24: ('_jr_n', ()),  # JRn
+    25: ('_add_hl_n', ('d', 'e')),  # ADDHLDE
+    26: ('_ld_a_r1r2m', ('d', 'e')),  # LDADEm
+    27: ('_dec_r_r', ('d', 'e')),  # DECDE
+    28: ('_inc_r', ('e',)),  # INCr_e
+    29: ('_dec_r', ('e',)),  # DECr_e
+    30: ('_ld_rn', ('e',)),  # LDrn_e
+    31: ('_raise_opcode_unimplemented', ()),  # RRA
+    32: ('_jr_cc_n', (FLAG_Z, 0x00)),  # JRNZn
+    33: ('_ld_r1r2_nn', ('h', 'l')),  # LDHLnn
+    34: ('_ld_hlmi_a', ()),  # LDHLIA
+    35: ('_inc_r_r', ('h', 'l')),  # INCHL
+    36: ('_inc_r', ('h',)),  # INCr_h
+    37: ('_dec_r', ('h',)),  # DECr_h
+    38: ('_ld_rn', ('h',)),  # LDrn_h
+    39: ('_raise_opcode_unimplemented', ()),  # XX
+    40: ('_jr_cc_n', (FLAG_Z, FLAG_Z)),  # JRZn
+    41: ('_add_hl_n', ('h', 'l')),  # ADDHLHL
+    42: ('_ld_a_hl_i', ()),  # LDAHLI
+    43: ('_dec_r_r', ('h', 'l')),  # DECHL
+    44: ('_inc_r', ('l',)),  # INCr_l
+    45: ('_dec_r', ('l',)),  # DECr_l
+    46: ('_ld_rn', ('l',)),  # LDrn_l
+    47: ('cpl', ()),  # CPL
+    48: ('_jr_cc_n', (0x10, 0x00)),  # JRNCn
+    49: ('_ld_sp_nn', ()),  # LD SP nn
+    50: ('_ld_hlmd_a', ()),  # LDHLDA
+    51: ('_inc_sp', ()),  # INC SP
+    52: ('_raise_opcode_unimplemented', ()),  # INCHLm
+    53: ('_raise_opcode_unimplemented', ()),  # DECHLm
+    54: ('_ld_hlm_n', ()),  # LDHLmn
+    55: ('_scf', ()),  # SCF
+    56: ('_jr_cc_n', (0x10, 0x10)),  # JRCn
+    57: ('_add_hl_sp', ()),  # ADDHLSP
+    58: ('_ld_a_hl_d', ()),  # LDAHLD
+    59: ('_dec_sp', ()),  # DECSP
+    60: ('_inc_r', ('a',)),  # INCr_a
+    61: ('_dec_r', ('a',)),  # DECr_a
+    62: ('_ld_rn', ('a',)),  # LDrn_a
+    63: ('_raise_opcode_unimplemented', ()),  # CCF
+    192: ('_ret_f', (FLAG_Z, 0x00)),  # RETNZ
+    193: ('_pop_nn', ('b', 'c')),  # POPBC
+    194: ('_jp_cc_nn', (FLAG_Z, 0x00)),  # JPNZnn
+    195: ('_jp_nn', ()),  # JPnn
+    196: ('_raise_opcode_unimplemented', ()),  # CALLNZnn
+    197: ('_push_nn', ('b', 'c')),  # PUSHBC
+    198: ('_raise_opcode_unimplemented', ()),  # ADDn
+    199: ('_rst_n', (0x00,)),  # RST00
+    200: ('_ret_f', (FLAG_Z, FLAG_Z)),  # RETZ
+    201: ('_ret', ()),  # RET
+    202: ('_jp_cc_nn', (FLAG_Z, FLAG_Z)),  # JPZnn
+    203: ('_call_cb_op', ()),  # MAPcb
+    204: ('_raise_opcode_unimplemented', ()),  # CALLZnn
+    205: ('_call_nn', ()),  # CALLnn
+    206: ('_raise_opcode_unimplemented', ()),  # ADCn
+    207: ('_rst_n', (0x08,)),  # RST08
+    208: ('_ret_f', (FLAG_C, 0x00)),  # RETNC
+    209: ('_pop_nn', ('d', 'e')),  # POPDE
+    210: ('_jp_cc_nn', (FLAG_C, 0x00)),  # JPNCnn
+    211: ('_raise_opcode_unimplemented', ()),  # XX
+    212: ('_raise_opcode_unimplemented', ()),  # CALLNCnn
+    213: ('_push_nn', ('d', 'e')),  # PUSHDE
+    214: ('_raise_opcode_unimplemented', ()),  # SUBn
+    215: ('_rst_n', (0x10,)),  # RST10
+    216: ('_ret_f', (FLAG_C, FLAG_C)),  # RETC
+    217: ('_reti', ()),  # RETI
+    218: ('_jp_cc_nn', (FLAG_C, FLAG_C)),  # JPCnn
+    219: ('_raise_opcode_unimplemented', ()),  # XX
+    220: ('_raise_opcode_unimplemented', ()),  # CALLCnn
+    221: ('_raise_opcode_unimplemented', ()),  # XX
+    222: ('_raise_opcode_unimplemented', ()),  # SBCn
+    223: ('_rst_n', (0x18,)),  # RST18
+    224: ('_ldh_n_a', ()),  # LDIOnA
+    225: ('_pop_nn', ('h', 'l')),  # POPHL
+    226: ('_ld_c_a', ()),  # LDIOCA
+    227: ('_raise_opcode_unimplemented', ()),  # XX
+    228: ('_raise_opcode_unimplemented', ()),  # XX
+    229: ('_push_nn', ('h', 'l')),  # PUSHHL
+    230: ('_and_n', ('pc',)),  # ANDn
+    231: ('_rst_n', (0x20,)),  # RST20
+    232: ('_add_sp_n', ()),  # ADDSPn
+    233: ('_raise_opcode_unimplemented', ()),  # JPHL
+    234: ('_ld_nn_a', ()),  # LD nn A
+    235: ('_raise_opcode_unimplemented', ()),  # XX
+    236: ('_raise_opcode_unimplemented', ()),  # XX
+    237: ('_raise_opcode_unimplemented', ()),  # XX
+    238: ('_raise_opcode_unimplemented', ()),  # ORn
+    239: ('_rst_n', (0x28,)),  # RST28
+    240: ('_ldh_a_n', ()),  # LD AIO n
+    241: ('_pop_nn', ('a', 'f')),  # POPAF
+    242: ('_ld_a_c', ()),  # LDAIOC
+    243: ('_di', ()),  # DI
+    244: ('_raise_opcode_unimplemented', ()),  # XX
+    245: ('_push_nn', ('a', 'f')),  # PUSHAF
+    246: ('_xor_n', ()),  # XORn
+    247: ('_rst_n', (0x30,)),  # RST30
+    248: ('_ld_hl_sp_n', ()),  # LD HL SP+n
+    249: ('_ld_sp_hl', ()),  # LS SP HL
+    250: ('_ld_a_nn', ()),  # LD A nn
+    251: ('_ei', ()),  # EI
+    252: ('_raise_opcode_unimplemented', ()),  # XX
+    253: ('_raise_opcode_unimplemented', ()),  # XX
+    254: ('_cp_n', ('pc',)),  # CPn
+    255: ('_rst_n', (0x38,)),  # RST38
+}
 
 
+def _decode_ld_alu_block(spec):
+    """Fill spec with the LD r,r' and ALU A,r opcodes (0x40-0xBF).
+
+    These opcodes encode their operands in bit fields: bits 0-2 select
+    the source register and bits 3-5 select the destination (LD) or the
+    ALU operation, so decode them from REG8 / ALU_OPS.
+    """
+    for op in range(0x40, 0xC0):
+        dst, src = REG8[(op >> 3) & 7], REG8[op & 7]
+        if op == 0x76:
+            entry = ('_halt', ())  # HALT
+        elif op < 0x80:
+            if src is None:
+                entry = ('_ld_r_hlm', (dst,))  # LDrHLm_r
+            elif dst is None:
+                entry = ('_ld_hlm_r', (src,))  # LDHLmr_r
+            else:
+                entry = ('_ld_rr', (dst, src))  # LDrr_rr
+        else:
+            alu = ALU_OPS[(op >> 3) & 7]
+            if src is None and alu != '_and_n':
+                entry = ('_raise_opcode_unimplemented', ())
+            else:
+                entry = (alu, (src or 'hl',))
+        spec[op] = entry
+
+
+def _decode_cb_block(spec):
+    """Fill spec with the CB-prefixed opcodes, decoded from their bit fields.
+
+    Bits 0-2 select the register (REG8).  For 0x00-0x3F bits 3-5 select
+    the rotate/shift (CB_SHIFT_OPS); above that bits 6-7 select BIT, RES
+    or SET and bits 3-5 the bit number, all handled by one method per
+    operation that _specialize compiles for each (bit, register).
+    """
+    for op in range(256):
+        reg = REG8[op & 7]
+        if op < 0x40:
+            name = CB_SHIFT_OPS[op >> 3]
+            if reg is not None and name == 'rlc':
+                entry = ('_rlc_n', (reg,))  # RLCr_r
+            elif reg is not None and name == 'swap':
+                entry = ('_swap_n', (reg,))  # SWAPr_r
+            else:
+                fn_name = name + ('r_' + reg if reg else 'hl')
+                entry = ('_raise_cb_op_unimplemented', (fn_name,))
+        else:
+            entry = ('_%s_b_r' % CB_BIT_OPS[op >> 6],
+                     ((op >> 3) & 7, reg or 'hl'))  # BITb_r, RESb_r...
+        spec[op] = entry
 
 
+_decode_ld_alu_block(_OPCODE_SPEC)
+_CB_SPEC = {}
+_decode_cb_block(_CB_SPEC)
 
 
+def _opcode_table(spec):
+    """Return the jump table for spec, indexed by opcode."""
+    table = []
+    for op in range(256):
+        name, args = spec[op]
+        if name == '_raise_opcode_unimplemented':
+            args = (op,)    # so the error can name the opcode
+        table.append(_specialize(getattr(GbZ80Cpu, name), args))
+    return table
 
 
+# Jump tables indexed by opcode; each entry is called as handler(cpu).
+GbZ80Cpu.OPCODES = _opcode_table(_OPCODE_SPEC)
+GbZ80Cpu.CB_OPCODES = _opcode_table(_CB_SPEC)
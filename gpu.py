@@ -74,7 +74,6 @@ class GbGpu(object):
     def step(self, m):
         """Perform one step."""
         self._mode_clock += m
-        print("linemode:", self._mode_funcs[self._linemode].__name__)
         self._mode_funcs[self._linemode]()
 
     def update_tile(self, addr, val):
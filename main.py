@@ -23,7 +23,7 @@ def main(filename):
 
     sys_interface = GbSystemInterface(gb_memory, cpu, gpu)
     for component in [cpu, gpu]:
-        component.sys_interface = sys_interface
+        component.set_system_interface(sys_interface)
 
     sys_interface.load_rom_image(filename)
 
@@ -35,7 +35,7 @@ def main(filename):
         sys.exit(0)
 
     except (Exception, KeyboardInterrupt) as e:
-        print('\ncpu clock:', sys_interface.cpu.clock['m'])
+        print('\ncpu clock:', sys_interface.cpu.clock_m)
         dump_logs(gb_memory.memory, cpu)
         raise e
 
@@ -16,6 +16,7 @@ class GbSystemInterface(object):
     MANUFACTURER_CODE_BYTE = 0x14B
     LANGUAGE_BYTE = 0x14A
     VERSION_BYTE = 0x14C
+    CYCLES_PER_FRAME = 17556    # machine cycles per 59.7Hz video frame
 
     def __init__(self, memory, cpu, gpu):
         """Init."""
@@ -50,7 +51,7 @@ class GbSystemInterface(object):
     def start_game(self):
         """Start the game."""
         while True:
-            self.cpu.execute_next_operation()
+            self.cpu.run_until(self.cpu.clock_m + self.CYCLES_PER_FRAME)
 
     def write_byte(self, address, value):
         """Write a byte to an address."""
@@ -58,7 +59,6 @@ class GbSystemInterface(object):
 
         if address >= 0x8000 and address <= 0xA000:     # VRAM write
             self.gpu.update_tile(address, value)
-            print("Writing to vram!", address, value)
 
     def write_word(self, address, value):
         """Write a word into memory."""